@@ -1,620 +1,585 @@
 # coding: utf-8
-from scene import *
-import random
-import json
-import datetime
-import os
-import threading
+import time
+LAUNCHED = time.perf_counter()  # Start of the time-to-first-frame measurement
 
-try:
-    import console
-    console_available = True
-except ImportError:
-    console_available = False
-    print("Console module not available. High scores will be anonymous.")
+from scene import Node, PORTRAIT, Scene, SpriteNode, Texture, get_screen_scale, run
 
-try:
-    import sound
-    sound_available = True
-except ImportError:
-    sound_available = False
-    print("Sound module not available. Game will run without sound.")
+from bricks.assets import AssetCache
+from bricks.audio import AudioManager, NullBackend
+from bricks.engine import GameEngine, BALL_RADIUS
+from bricks.highscores import HighScoreStore
+from bricks.hud import GameOverOverlay, Hud, PauseOverlay, ProfilerOverlay
+from bricks.pool import NodePool
+from bricks.profiler import FrameProfiler, profiled
+from bricks.quality import (BATCHED_BRICKS, FLAT_BACKGROUND, HUD_EVERY, SLOW_HUD, SPAWN_CAP,
+                            SPAWN_FLOOR, QualityGovernor)
+from bricks.snapshot import SnapshotWriter, capture, restore
+from bricks.startup import StartupTimer, optional_module, scaled_background
+from bricks.tasks import TaskRunner
+from bricks.telemetry import SessionTracker, TelemetryLog
+from bricks.touch import TouchInput
+
+DIFFICULTY = 'normal'  # 'normal' or 'storm' (many more bricks on screen)
+PROFILE = False  # Frame profiler overlay; writes frame_trace.json on exit
+RECORD_REPLAY = True  # Save each finished game to last_replay.fbr
+REPLAY_FILE = None  # Path of a .fbr replay to watch instead of playing
+ADAPTIVE_QUALITY = True  # Trade visuals for frame rate when frames run long
+TELEMETRY = True  # Log each game to telemetry/ (see bricks/telemetry.py)
+LEADERBOARD_URL = None  # e.g. 'http://192.168.1.20:8765' (python -m bricks.leaderboard serve)
+SNAPSHOT_FILE = 'snapshot.fbs'  # Checkpoint of the game in progress, resumed on launch
+CHECKPOINT_EVERY = 2.0  # Seconds of play between checkpoints
+AUTOPLAY = False  # Let the lookahead bot play, for soak tests (see bricks/autoplay.py)
+
+# console and sound are imported on a worker after the first frame; the
+# autoplay, leaderboard and replay modules only when their settings ask for them
+CONSOLE_MISSING = "Console module not available. High scores will be anonymous."
+SOUND_MISSING = "Sound module not available. Game will run without sound."
+
+# Game states
+PLAYING = 'playing'
+COUNTDOWN = 'countdown'  # Game over screen, counting down to the scores
+SCORE_ENTRY = 'score_entry'  # Waiting for the high score name prompt
+LEADERBOARD = 'leaderboard'  # Scores shown; a tap restarts
+PAUSED = 'paused'  # Frozen by the pause button or by the app going to the background
 
 class FallingBricksGame(Scene):
     def setup(self):
-        # Try to load background image, fallback to color if not available
+        self.profiler = FrameProfiler(enabled=PROFILE)
+        self.profiler_overlay = None
+        self.quality = QualityGovernor() if ADAPTIVE_QUALITY else None
+        self.frame = 0
+        self.sync_every = 1  # Frames between brick node syncs
+        self.hud_every = 1  # Frames between score redraws
+        self.frame_dt = 0.0  # This frame's dt, zeroed for the frame after a pause
+        self.resume_state = None  # State to go back to when unpaused
+        self.paused_by_user = False
+        self.paused_at = 0.0
+        self.resuming = False
+        self.music_was_playing = False
+        self.startup = StartupTimer(LAUNCHED, ('setup', 'first_frame', 'background', 'audio'),
+                                    self.profiler)
+        self.setup_scene()
+        self.startup.mark('setup')
+    
+    @profiled('setup')
+    def setup_scene(self):
+        # Every texture is loaded (or found missing) once, here or on first use
+        self.assets = AssetCache(Texture)
+        
+        # Blocking work runs on workers; results come back through update()
+        self.tasks = TaskRunner()
+        
+        # Play on a plain background until the scaled image is ready
+        self.background = None
+        self.background_color = '#1a1a1a'
+        self.tasks.submit(scaled_background, 'background.jpg',
+                          (self.size.width, self.size.height), get_screen_scale(),
+                          on_done=self.background_ready, on_error=self.background_failed)
+        
+        # Layers, back to front: game world, HUD, game over overlay
+        self.world = Node(parent=self)
+        self.ball_radius = BALL_RADIUS
+        self.bricks = Node(parent=self.world)
+        self.brick_pool = NodePool(self.create_brick_node, self.hide_brick_node,
+                                   destroy=lambda node: node.remove_from_parent(),
+                                   prealloc=16)
+        self.state = PLAYING
+        self.game_over_time = None
+        
+        # High scores are read once here and saved in the background; with a
+        # server set, they are also synced to the global board in the background
+        self.high_scores = HighScoreStore('high_scores.json')
+        self.leaderboard = None
+        self.world_scores = None
+        self.local_scores = []
+        if LEADERBOARD_URL and not REPLAY_FILE and not AUTOPLAY:
+            from bricks.leaderboard import LeaderboardClient
+            self.leaderboard = LeaderboardClient(
+                LEADERBOARD_URL,
+                on_board=lambda board: self.tasks.call_soon(self.world_scores_ready, board))
+        
+        # All game state lives in the headless engine; this scene only renders it
+        replay = None
+        if REPLAY_FILE or RECORD_REPLAY:
+            from bricks.replay import Replay, ReplayPlayer, ReplayRecorder
+        if REPLAY_FILE:
+            replay = Replay.load(REPLAY_FILE)
+        if replay is not None:
+            self.engine = GameEngine(replay.width, replay.height, listener=self,
+                                     difficulty=replay.difficulty)
+        else:
+            self.engine = GameEngine(self.size.width, self.size.height, listener=self,
+                                     difficulty=DIFFICULTY)
+        self.engine.profiler = self.profiler
+        self.recorder = ReplayRecorder() if RECORD_REPLAY and replay is None else None
+        self.engine.recorder = self.recorder
+        
+        # Touches are buffered and applied once per frame, in update()
+        self.touch_input = TouchInput()
+        
+        # The bot feeds touch_input like a finger does; it never plays replays
+        self.autoplayer = None
+        if AUTOPLAY and replay is None:
+            from bricks.autoplay import Autoplayer
+            self.autoplayer = Autoplayer()
+        
+        # Per-game stats, logged in the background; replays and bot games aren't logged
+        logged = TELEMETRY and replay is None and self.autoplayer is None
+        self.telemetry = TelemetryLog('telemetry') if logged else None
+        self.session = SessionTracker()
+        self.session_logged = False
+        
+        # Games in progress are checkpointed in the background, to resume after a kill
+        self.snapshots = None
+        if SNAPSHOT_FILE and replay is None and self.autoplayer is None:
+            self.snapshots = SnapshotWriter(SNAPSHOT_FILE)
+        self.last_checkpoint = 0.0
+        
+        # Background music and sound effects come up in the background too;
+        # until then effects go to a silent backend
+        self.audio = AudioManager(NullBackend())
+        self.tasks.submit(self.prepare_audio, on_done=self.audio_ready, on_error=self.audio_failed)
+        
+        # Player setup, with a plain blue ball if the sprite asset is missing
+        texture, color = self.assets.look('pzl:BallBlue', 'blue', pin=True)
+        self.player = SpriteNode(texture, color=color, position=(self.engine.player_x, self.engine.player_y))
+        if texture is not None:
+            self.player.scale = self.ball_radius / (self.player.size.width/2)
+        else:
+            self.player.size = (self.ball_radius * 2, self.ball_radius * 2)
+        self.world.add_child(self.player)
+        
+        # Level 1 and 2 brick textures up front; later ones a level ahead
+        self.prewarm_first_levels()
+        
+        # UI elements: score and level only redraw when their value changes
+        self.hud = Hud(self, self.size)
+        if self.profiler.enabled:
+            self.profiler_overlay = ProfilerOverlay(self.profiler, self.hud.root, self.size)
+        self.overlay = Node(parent=self)
+        self.game_over_screen = GameOverOverlay(self.hud, self.overlay, self.size)
+        self.pause_screen = PauseOverlay(self.overlay, self.size)
+        
+        # Pick up a checkpointed game, or generate the first set of bricks
+        # and start the spawn timer
+        self.replay_player = None
+        if replay is not None:
+            self.replay_player = ReplayPlayer(replay, self.engine)
+        elif not self.resume_checkpoint():
+            self.engine.reset()
+            self.begin_session()
+    
+    def begin_session(self):
+        self.session_logged = self.telemetry is not None
+        if self.session_logged:
+            self.telemetry.append(self.session.begin(self.engine))
+    
+    def resume_checkpoint(self):
+        """Restore the last checkpoint, if any; the bricks' nodes are built as
+        they are restored. Returns True if a game was resumed."""
+        data = self.snapshots.load() if self.snapshots is not None else None
+        if data is None:
+            return False
         try:
-            self.background = SpriteNode('background.jpg', parent=self)
+            restore(self.engine, data)
+        except ValueError as e:
+            print(f"Could not resume saved game: {e}")
+            return False
+        # The replay and telemetry would be missing the start of this game
+        self.engine.recorder = None
+        self.last_checkpoint = self.engine.time
+        self.hud.set_score(self.engine.score)
+        self.hud.set_level(self.engine.level)
+        self.player.position = (self.engine.player_x, self.engine.player_y)
+        self.pause_game(by_user=True)  # Carry on with a tap, not straight into falling bricks
+        return True
+    
+    def checkpoint(self):
+        with self.profiler.scope('snapshot'):
+            self.snapshots.save(capture(self.engine))  # Written on the snapshot thread
+        self.last_checkpoint = self.engine.time
+    
+    # Startup stages finishing on workers; the callbacks run in update()
+    def background_ready(self, path):
+        texture = self.assets.texture(path, pin=True)
+        if texture is not None:
+            self.background = SpriteNode(texture)
+            if self.quality is None or self.quality.tier < FLAT_BACKGROUND:
+                self.world.add_child(self.background)
             self.background.size = self.size
             self.background.position = (self.size.width/2, self.size.height/2)
             self.background.z_position = -1  # Place behind other elements
-        except Exception as e:
-            print(f"Background image not available: {e}")
-            self.background_color = '#1a1a1a'  # Fallback to dark background
-            
-        self.score = 0
-        self.game_over = False
-        self.last_time = 0
-        self.level = 1
-        self.ball_radius = 15
-        self.bricks = Node(parent=self)
-        self.last_milestone = 0  # Track the last 20-point milestone reached
-        self.milestone_boost = 1.0  # Speed multiplier that increases at milestones
-        self.waiting_for_input = False
-        
-        # Initialize brick entry timing system
-        self.entry_times = {
-            'next_time': 0,           # Will be set after setup
-            'min_delay': 0.3,         # Minimum delay between bricks
-            'max_delay': 2.0,         # Maximum delay between bricks
-            'speed_factor': 0.9       # Speed increases by 10% per level
-        }
-        
-        # Setup background music
-        self.setup_background_music()
-        
-        # Player setup
-        try:
-            self.player = SpriteNode('pzl:BallBlue', position=(self.size.width/2, self.ball_radius + 10))
-            self.player.scale = self.ball_radius / (self.player.size.width/2)
-            self.add_child(self.player)
-        except Exception as e:
-            # Fallback if sprite asset is not available
-            print(f"Using fallback player: {e}")
-            self.player = SpriteNode(color='blue', position=(self.size.width/2, self.ball_radius + 10))
-            self.player.size = (self.ball_radius * 2, self.ball_radius * 2)
-            self.add_child(self.player)
-        
-        # UI elements
-        self.score_label = LabelNode('Score: 0', position=(100, self.size.height - 30), 
-                                     font=('Helvetica', 18), parent=self)
-        self.level_label = LabelNode('Level: 1', position=(self.size.width - 100, self.size.height - 30), 
-                                     font=('Helvetica', 18), parent=self)
-        
-        # Generate first set of bricks
-        self.generate_brick_set()
-        
-        # Set initial time AFTER setup is complete
-        self.last_time = self.t
-        self.entry_times['next_time'] = self.t + 1.0  # Initial delay before first random brick
+        self.startup.mark('background')
     
-    # High score functions
-    def load_high_scores(self):
-        try:
-            if os.path.exists('high_scores.json'):
-                with open('high_scores.json', 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading high scores: {e}")
-        return []
+    def background_failed(self, e):
+        print(f"Background image not available: {e}")
+        self.startup.mark('background')
     
-    def save_high_scores(self, scores):
+    def prepare_audio(self):
+        """Worker: import sound and console, preload effects and open the music"""
+        optional_module('console', CONSOLE_MISSING)
+        sound = optional_module('sound', SOUND_MISSING)
+        audio = AudioManager(sound if sound is not None else NullBackend())
+        audio.configure(0.15)  # 15% volume, and play even when the device is muted
+        audio.preload()
         try:
-            with open('high_scores.json', 'w') as f:
-                json.dump(scores[:5], f)
+            audio.open_music('ode_to_joy.m4a')  # File in same folder, looped
         except Exception as e:
-            print(f"Error saving high scores: {e}")
+            print(f"Sound initialization error: {e}")
+        return audio
     
-    def check_high_score(self, score):
-        scores = self.load_high_scores()
-        
-        # If fewer than 5 scores, automatically qualifies
-        if len(scores) < 5:
-            return True
-            
-        # Check if score beats any existing entry
-        for entry in scores:
-            if score > entry.get('score', 0):
-                return True
-                
-        return False
-    
-    def update_high_scores(self, score, name):
-        scores = self.load_high_scores()
-        new_entry = {
-            'score': score,
-            'name': name if name else "Anonymous",
-            'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-        }
-        
-        scores.append(new_entry)
-        scores.sort(key=lambda x: x['score'], reverse=True)
-        self.save_high_scores(scores[:5])
-        return scores[:5]
-    
-    def setup_background_music(self):
-        """Setup the background music player with ode_to_joy.m4a at 15% volume"""
-        self.bg_music = None
-        if sound_available:
-            try:
-                # Use proper Pythonista sound API parameters
-                sound.set_volume(0.15)  # Set volume to 15%
-                sound.set_honors_silent_switch(False)  # Play even when device is muted
-                self.bg_music = sound.Player('ode_to_joy.m4a')  # File in same folder
-                self.bg_music.number_of_loops = -1  # Loop indefinitely (-1)
-                # Start playing immediately
-                self.bg_music.play()
-            except Exception as e:
-                print(f"Sound initialization error: {e}")
-    
-    def stop_background_music(self):
-        """Stop the background music"""
-        if sound_available and hasattr(self, 'bg_music') and self.bg_music:
-            try:
-                self.bg_music.stop()
-            except Exception:
-                pass
-    
-    def add_random_brick(self):
-        """Add a single random brick at the top of the screen"""
-        # Brick properties
-        brick_width = 60
-        brick_height = 20
-        
-        # Choose a random horizontal position
-        x = random.uniform(brick_width/2, self.size.width - brick_width/2)
-        
-        # Choose brick color based on level
-        colors = ['pzl:Red8', 'pzl:Green8', 'pzl:Yellow8', 'pzl:Purple8', 'pzl:Blue8']
-        fallback_colors = ['#ff0000', '#00ff00', '#ffff00', '#800080', '#0000ff']
-        color_index = (self.level - 1) % len(colors)
-        
-        try:
-            brick = SpriteNode(colors[color_index], position=(x, self.size.height + brick_height))
-        except Exception:
-            brick = SpriteNode(color=fallback_colors[color_index], position=(x, self.size.height + brick_height))
-        
-        brick.size = (brick_width, brick_height)
-        # Apply base speed, level modifier, and milestone boost
-        brick.speed = (2 + (self.level * 0.2)) * 1.33 * self.milestone_boost
-        self.bricks.add_child(brick)
-        
-        # Schedule next brick entry with randomized timing
-        base_delay = self.entry_times['max_delay'] * (self.entry_times['speed_factor'] ** (self.level - 1))
-        base_delay = max(self.entry_times['min_delay'], base_delay)
-        random_delay = random.uniform(base_delay * 0.5, base_delay * 1.5)
-        self.entry_times['next_time'] = self.t + random_delay
-    
-    def clear_bricks(self):
-        # Safely remove each brick individually instead of using remove_all_children()
-        for brick in list(self.bricks.children):
-            brick.remove_from_parent()
-    
-    def generate_brick_set(self):
-        # Clear existing bricks
-        self.clear_bricks()
-        
-        # Brick properties
-        brick_width = 60
-        brick_height = 20
-        min_spacing = brick_width / 4  # Quarter brick spacing
+    def audio_ready(self, audio):
+        audio.update(self.t)
+        self.audio = audio
+        if self.state == PAUSED:
+            self.music_was_playing = not self.engine.game_over  # Starts on resume
+        elif not self.engine.game_over:
+            audio.play_music()
+        self.startup.mark('audio')
+    
+    def audio_failed(self, e):
+        print(f"Sound initialization error: {e}")
+        self.startup.mark('audio')
+    
+    # Brick node pool
+    def create_brick_node(self):
+        return SpriteNode(parent=self.bricks)
+    
+    def hide_brick_node(self, node):
+        node.alpha = 0
+        node.position = (-1000, -1000)
+    
+    # Engine listener callbacks
+    def on_brick_added(self, brick):
+        texture, color = self.assets.brick_look(brick.color_index)
+        node = self.brick_pool.acquire()
+        node.texture = texture
+        node.color = color
+        node.size = (brick.width, brick.height)
+        node.position = (brick.x, brick.y)
+        node.alpha = 1
+        brick.node = node
+    
+    def on_brick_removed(self, brick):
+        if brick.node is not None:
+            self.brick_pool.release(brick.node)
+            brick.node = None
+    
+    def prewarm_first_levels(self):
+        # A long game can push these out of the LRU; a no-op once they're cached
+        self.assets.prewarm_brick(self.engine.color_index(1))
+        self.assets.prewarm_brick(self.engine.color_index(2))
+    
+    def on_level_up(self, level, milestone):
+        self.hud.set_level(level)
+        self.session.level_up(self.engine)
         
-        # Ensure at least 3 bricks
-        num_bricks = max(3, min(random.randint(1, self.level + 2), 5))
+        # Load the next level's brick texture now, on a later frame's task
+        # budget, so the next level-up never waits on it
+        self.tasks.call_soon(self.assets.prewarm_brick, self.engine.color_index(level + 1))
         
-        # Create potential positions with proper spacing
-        positions = []
-        x = brick_width / 2
-        while x <= self.size.width - brick_width / 2:
-            positions.append(x)
-            x += brick_width + min_spacing
+        with self.profiler.scope('audio'):
+            self.audio.play('milestone' if milestone else 'set_cleared')
+    
+    def on_game_over(self):
+        self.audio.pause_music()  # Stop music before game over
+        self.show_game_over()
+        if self.session_logged:
+            self.telemetry.append(self.session.end(self.engine))
+        if self.engine.recorder is not None and self.recorder.finished is not None:
+            self.tasks.submit(self.recorder.finished.save, 'last_replay.fbr')
+        if self.snapshots is not None:
+            self.snapshots.discard()  # Nothing to resume
+        if self.leaderboard is not None:
+            self.leaderboard.refresh()  # Costs no payload if the board hasn't changed
+        # Reload the opening levels' textures behind the game over screen
+        self.tasks.call_soon(self.prewarm_first_levels)
+    
+    def update(self):
+        if self.state == PAUSED:
+            if not self.startup.done:
+                # A resumed game opens paused; let startup finish behind the pause screen
+                self.tasks.drain(budget=0.002)
+                self.startup.mark('first_frame')
+            return  # Nothing runs while paused: no physics, tasks, audio or profiling
+        self.frame_dt = self.dt
+        resumed = self.resuming
+        if resumed:
+            self.end_pause()
+        profiler = self.profiler
+        profiler.begin_frame()
+        self.frame += 1
+        started = time.perf_counter()
+        self.update_frame()
+        work = time.perf_counter() - started  # Frame time can't show headroom under vsync
+        if not self.startup.done:
+            self.startup.mark('first_frame')
+        if self.frame == 1:
+            # The rest of the digit glyphs render a few per frame from here on
+            self.hud.glyphs.prewarm_later(self.tasks.call_soon)
+        if resumed:
+            return  # The first frame back has no meaningful frame time
+        if self.state == PLAYING:
+            self.session.frame(self.frame_dt)
+        if self.quality is not None:
+            tier = self.quality.sample(self.frame_dt, work)
+            if tier is not None:
+                self.apply_quality(tier)
+        if profiler.enabled:
+            if self.quality is not None:
+                profiler.count('quality_tier', self.quality.tier)
+            profiler.count('bricks', self.engine.store.count)
+            profiler.count('pool_free', len(self.brick_pool.free))
+            profiler.count('pool_misses', self.brick_pool.misses)
+            profiler.count('pool_hits', self.brick_pool.hits)
+            profiler.count('pool_high_water', self.brick_pool.high_water)
+            profiler.end_frame()
+            if self.profiler_overlay is not None:
+                self.profiler_overlay.update()
+    
+    def update_frame(self):
+        profiler = self.profiler
         
-        # Brick colors with fallbacks
-        colors = ['pzl:Red8', 'pzl:Green8', 'pzl:Yellow8', 'pzl:Purple8', 'pzl:Blue8']
-        fallback_colors = ['#ff0000', '#00ff00', '#ffff00', '#800080', '#0000ff']
-        color_index = (self.level - 1) % len(colors)
+        # Apply finished background work on the render thread, within budget
+        with profiler.scope('tasks'):
+            self.tasks.drain(budget=0.002)
+        self.audio.update(self.t)
         
-        # Randomly select positions
-        if positions:  # Check if positions list is not empty
-            random.shuffle(positions)
-            selected_positions = positions[:num_bricks]
+        if self.state == COUNTDOWN:
+            # Check if game over screen has been shown for 5 seconds
+            elapsed = self.t - self.game_over_time
+            remaining = max(0, 5 - int(elapsed))  # Changed from 15 to 5 seconds
             
-            # Create bricks
-            for x in selected_positions:
-                try:
-                    # Try to create brick with sprite
-                    brick = SpriteNode(colors[color_index], position=(x, self.size.height + brick_height))
-                    brick.size = (brick_width, brick_height)
-                except Exception:
-                    # Fallback to colored rectangle
-                    brick = SpriteNode(color=fallback_colors[color_index], 
-                                      position=(x, self.size.height + brick_height))
-                    brick.size = (brick_width, brick_height)
-                
-                # Apply base speed, level modifier, and milestone boost
-                brick.speed = (2 + self.level * 0.2) * 1.33 * self.milestone_boost
-                
-                self.bricks.add_child(brick)
-        
-        # Ensure and randomize safe passages
-        if self.bricks.children:
-            self.ensure_safe_passage()
-            self.randomize_gap_positions()
-    
-    def check_milestone(self):
-        """Check if player reached a 20-point milestone and apply boost if needed"""
-        current_milestone = int(self.score // 20)  # Changed from 50 to 20
-        if current_milestone > self.last_milestone:
-            # Player reached a new 20-point milestone
-            self.last_milestone = current_milestone
-            self.milestone_boost *= 1.33  # Apply additional 33% boost
-            self.level += 1  # Increase level at each milestone
-            self.level_label.text = f'Level: {self.level}'
+            # Update the countdown display (no-op unless the second changed)
+            self.game_over_screen.countdown.set(remaining)
             
-            # Visual/audio feedback for milestone
-            if sound_available:
-                try:
-                    sound.play_effect('digital:PowerUp9')
-                except Exception:
-                    pass
-    
-    def ensure_safe_passage(self):
-        # Ball's required clearance (diameter)
-        required_gap = self.ball_radius * 2 + 5  # 35 units
-        
-        # Get current brick positions sorted left-to-right
-        bricks = sorted(self.bricks.children, key=lambda b: b.position.x)
-        
-        # Check existing gaps including screen edges
-        gaps = []
-        prev_right = 0  # Left screen edge
-        
-        for brick in bricks:
-            current_left = brick.position.x - brick.size.width/2
-            gap = current_left - prev_right
-            if gap >= required_gap:
-                gaps.append((prev_right, current_left))
-            prev_right = brick.position.x + brick.size.width/2
-        
-        # Check right screen edge
-        gap = self.size.width - prev_right
-        if gap >= required_gap:
-            gaps.append((prev_right, self.size.width))
-        
-        # If enough gaps exist, do nothing
-        if len(gaps) >= 2:
-            return
-        
-        # Create necessary gaps by repositioning bricks
-        target_gaps = 2
-        created_gaps = 0
-        
-        # First ensure left screen edge gap
-        if not any(g[0] == 0 for g in gaps):
-            # Make space at far left
-            if bricks:
-                leftmost = bricks[0]
-                new_x = required_gap + leftmost.size.width/2
-                if new_x < leftmost.position.x:
-                    leftmost.position.x = new_x
-                    created_gaps += 1
-        
-        # Then ensure right screen edge gap
-        if not any(g[1] == self.size.width for g in gaps):
-            if bricks:
-                rightmost = bricks[-1]
-                new_x = self.size.width - required_gap - rightmost.size.width/2
-                if new_x > rightmost.position.x:
-                    rightmost.position.x = new_x
-                    created_gaps += 1
-        
-        # Create middle gaps if still needed
-        if created_gaps < target_gaps and len(bricks) >= 2:
-            # Find largest existing gap between bricks
-            max_gap_size = 0
-            max_gap_index = -1
-            for i in range(1, len(bricks)):
-                gap = (bricks[i].position.x - bricks[i].size.width/2) - \
-                      (bricks[i-1].position.x + bricks[i-1].size.width/2)
-                if gap > max_gap_size:
-                    max_gap_size = gap
-                    max_gap_index = i
-            
-            # Enlarge the largest gap if possible
-            if max_gap_size > 0 and max_gap_index != -1:
-                left_brick = bricks[max_gap_index-1]
-                right_brick = bricks[max_gap_index]
-                needed_space = required_gap - max_gap_size
-                
-                if needed_space > 0:
-                    # Calculate available movement space
-                    left_available = left_brick.position.x - left_brick.size.width/2
-                    right_available = self.size.width - (right_brick.position.x + right_brick.size.width/2)
-                    
-                    # Distribute space adjustment
-                    left_adjust = min(needed_space/2, left_available)
-                    right_adjust = min(needed_space/2, right_available)
-                    
-                    # Reposition bricks
-                    left_brick.position.x -= left_adjust
-                    right_brick.position.x += right_adjust
-                    created_gaps += 1
-
-        # Final check and fallback
-        if created_gaps < target_gaps and len(bricks) > 0:
-            # Remove middle brick to create emergency gap
-            middle_index = len(bricks) // 2
-            bricks[middle_index].remove_from_parent()
-    
-    def randomize_gap_positions(self):
-        """Randomizes horizontal positions of safe gaps"""
-        if not self.bricks.children:
-            return
-        
-        bricks = sorted(self.bricks.children, key=lambda b: b.position.x)
-        if not bricks:
+            # Transition when timer reaches zero
+            if remaining == 0:
+                self.handle_high_score()
+        elif self.state == LEADERBOARD and self.autoplayer is not None:
+            self.reset_game()  # Soak tests go straight into the next game
+        if self.state != PLAYING:
             return
-            
-        brick_width = bricks[0].size.width
-        
-        # Calculate formation boundaries
-        leftmost = bricks[0].position.x - brick_width/2
-        rightmost = bricks[-1].position.x + brick_width/2
         
-        # Calculate maximum safe shift range
-        max_shift_left = leftmost
-        max_shift_right = self.size.width - rightmost
-        
-        if max_shift_left + max_shift_right > 0:
-            # Apply random shift within safe limits
-            shift = random.uniform(-max_shift_left, max_shift_right)
-            for brick in bricks:
-                brick.position.x += shift
+        # Run fixed physics ticks for this frame's dt, then draw on-screen
+        # bricks interpolated between the last two ticks
+        with profiler.scope('physics'):
+            if self.replay_player is not None:
+                alpha = self.replay_player.frame()
+                self.player.position = (self.engine.player_x, self.engine.player_y)
+            else:
+                if self.autoplayer is not None:
+                    with profiler.scope('autoplay'):
+                        # The bot's finger position, one sample per frame
+                        self.touch_input.add(self.autoplayer(self.engine, self.frame_dt), self.t)
+                self.apply_touches()
+                alpha = self.engine.advance(self.frame_dt)
+        with profiler.scope('sync'):
+            if self.frame % self.sync_every == 0:
+                if self.sync_every > 1:
+                    alpha = 1.0  # No interpolation when syncing in batches
+                for brick, x, y in self.engine.store.visible(alpha, self.size.height):
+                    brick.node.position = (x, y)
+            self.brick_pool.trim(self.t)
+        if (self.snapshots is not None and not self.engine.game_over
+                and self.engine.time - self.last_checkpoint >= CHECKPOINT_EVERY):
+            self.checkpoint()
+        if self.frame % self.hud_every == 0:
+            with profiler.scope('hud'):
+                self.hud.set_score(self.engine.score)
     
-    def update(self):
-        if self.game_over:
-            # Check if game over screen has been shown for 5 seconds
-            if hasattr(self, 'game_over_time') and hasattr(self, 'countdown_label'):
-                elapsed = self.t - self.game_over_time
-                remaining = max(0, 5 - int(elapsed))  # Changed from 15 to 5 seconds
-                
-                # Update the countdown display
-                if hasattr(self, 'countdown_value') and remaining != self.countdown_value:
-                    self.countdown_value = remaining
-                    self.countdown_label.text = f'Continuing in {remaining} seconds...'
-                
-                # Transition when timer reaches zero
-                if remaining == 0 and not hasattr(self, 'high_scores_shown'):
-                    self.high_scores_shown = True
-                    self.handle_high_score()
+    def apply_quality(self, tier):
+        """Switch rendering to quality `tier` (see bricks/quality.py)"""
+        if self.background is not None:
+            if tier >= FLAT_BACKGROUND and self.background.parent is not None:
+                self.background.remove_from_parent()
+            elif tier < FLAT_BACKGROUND and self.background.parent is None:
+                self.world.add_child(self.background)
+        self.sync_every = 2 if tier >= BATCHED_BRICKS else 1
+        self.hud_every = HUD_EVERY if tier >= SLOW_HUD else 1
+        if self.replay_player is None:  # Replays carry their own spawn floors
+            self.engine.set_spawn_floor(SPAWN_FLOOR if tier >= SPAWN_CAP else 0)
+    
+    # Pausing. Scene.pause()/resume() are called when the app goes to the
+    # background and comes back; the pause button pauses until a tap.
+    def pause(self):
+        self.pause_game(by_user=False)
+    
+    def resume(self):
+        if self.state == PAUSED and not self.paused_by_user:
+            self.resume_game()
+    
+    def pause_game(self, by_user):
+        if self.state == PAUSED:
+            self.paused_by_user = self.paused_by_user or by_user
             return
-            
-        # Update score with proper time delta
-        current_time = self.t
-        elapsed = current_time - self.last_time
-        self.score += elapsed
-        self.score_label.text = f'Score: {int(self.score)}'
-        self.last_time = current_time
-        
-        # Check for 20-point milestones
-        self.check_milestone()
-        
-        # Check if all bricks have passed
-        all_bricks_passed = True
-        
-        # Update brick positions and check collisions
-        for brick in list(self.bricks.children):
-            # Move brick down
-            brick.position = (brick.position.x, brick.position.y - brick.speed)
-            
-            # Check if brick reached bottom
-            if brick.position.y < -brick.size.height:
-                brick.remove_from_parent()
-            else:
-                all_bricks_passed = False
-                
-                # Check collision with player
-                if self.check_collision(brick, self.player):
-                    self.game_over = True
-                    self.stop_background_music()  # Stop music before game over
-                    self.show_game_over()
-                    break
-        
-        # Check if it's time to add a new random brick
-        if self.t >= self.entry_times['next_time']:
-            self.add_random_brick()
-        
-        # If all bricks have passed, generate a new set and increase level
-        if all_bricks_passed and len(self.bricks.children) == 0:
-            self.level += 1
-            self.level_label.text = f'Level: {self.level}'
-            self.generate_brick_set()
-            
-            # Play sound effect if available
-            if sound_available:
-                try:
-                    sound.play_effect('digital:PowerUp7')
-                except Exception:
-                    pass  # Continue if sound fails
-    
-    def check_collision(self, brick, player):
-        # Circle-rectangle collision detection
-        try:
-            circle_x, circle_y = player.position
-            
-            # Find closest point on rectangle to circle
-            closest_x = max(brick.position.x - brick.size.width/2, 
-                            min(circle_x, brick.position.x + brick.size.width/2))
-            closest_y = max(brick.position.y - brick.size.height/2, 
-                            min(circle_y, brick.position.y + brick.size.height/2))
-            
-            # Calculate distance
-            distance_x = circle_x - closest_x
-            distance_y = circle_y - closest_y
-            distance_squared = distance_x**2 + distance_y**2
-            
-            return distance_squared < (self.ball_radius**2)
-        except Exception:
-            return False  # Default to no collision on error
+        if self.state == PLAYING and self.snapshots is not None:
+            self.checkpoint()  # Going to the background is often the last we hear
+        self.resume_state = self.state
+        self.state = PAUSED
+        self.paused_by_user = by_user
+        self.paused_at = self.t
+        self.resuming = False
+        self.music_was_playing = self.audio.music_playing
+        self.audio.pause_music()
+        self.touch_input.release()
+        self.pause_screen.show()
+    
+    def resume_game(self):
+        # The clock catches up on the next update(), where self.t is current
+        self.state = self.resume_state
+        self.resuming = True
+        self.pause_screen.hide()
     
+    def end_pause(self):
+        """First frame after a pause: shift timers past the paused time and
+        drop this frame's dt, so nothing jumps and physics doesn't catch up"""
+        self.resuming = False
+        self.frame_dt = 0.0
+        if self.game_over_time is not None:
+            self.game_over_time += self.t - self.paused_at
+        if self.music_was_playing and self.state == PLAYING:
+            self.audio.play_music()
+    
+    @profiled('reset_game')
     def reset_game(self):
-        # Reset game state
-        self.score = 0
-        self.game_over = False
-        self.last_time = self.t  # Use current time for reset
-        self.level = 1
-        self.last_milestone = 0  # Reset milestone tracking
-        self.milestone_boost = 1.0  # Reset speed boost
-        self.waiting_for_input = False
-        
-        # Remove timeout attributes
-        if hasattr(self, 'game_over_time'):
-            delattr(self, 'game_over_time')
-        if hasattr(self, 'high_scores_shown'):
-            delattr(self, 'high_scores_shown')
-        if hasattr(self, 'countdown_label'):
-            delattr(self, 'countdown_label')
-        if hasattr(self, 'countdown_value'):
-            delattr(self, 'countdown_value')
-        
-        # Reset brick entry timing
-        self.entry_times['next_time'] = self.t + 1.0
+        # Reset game state; the engine clears old bricks and generates new ones
+        if self.replay_player is not None:
+            from bricks.replay import ReplayPlayer
+            self.replay_player = ReplayPlayer(self.replay_player.replay, self.engine)
+        else:
+            self.engine.recorder = self.recorder  # Detached while a resumed game ran
+            self.engine.reset()
+            self.begin_session()
+        self.state = PLAYING
+        self.game_over_time = None
+        self.last_checkpoint = 0.0
+        self.prewarm_first_levels()  # In case the game over screen was skipped
         
         # Update UI
-        self.score_label.text = 'Score: 0'
-        self.level_label.text = 'Level: 1'
-        
-        # Reset player position
-        self.player.position = (self.size.width/2, self.ball_radius + 10)
+        self.hud.set_score(0)
+        self.hud.set_level(1)
         
-        # Remove game over UI elements
-        for child in list(self.children):
-            if child != self.player and child != self.bricks and child != self.score_label and child != self.level_label:
-                child.remove_from_parent()
+        # Reset player position, forgetting touches from the last game
+        self.touch_input.reset()
+        self.player.position = (self.engine.player_x, self.engine.player_y)
         
-        # Generate new bricks
-        self.generate_brick_set()
+        # Detach the game over screen; it's kept for the next game
+        self.game_over_screen.hide()
         
-        # Restart background music
-        if hasattr(self, 'bg_music') and self.bg_music:
-            self.bg_music.play()
+        # Pick the background music up where it left off
+        self.audio.play_music()
+    
+    def stop(self):
+        # Scene is closing: give any pending high score save a moment to land
+        self.high_scores.flush(timeout=1.0)
+        if self.leaderboard is not None:
+            self.leaderboard.close(timeout=1.0)  # Unsent scores stay in the outbox
+        if self.telemetry is not None:
+            self.telemetry.close(timeout=1.0)
+        if self.snapshots is not None:
+            if self.replay_player is None and not self.engine.game_over:
+                self.checkpoint()  # Closed mid-game: carry on next launch
+            self.snapshots.close(timeout=1.0)
+        self.tasks.shutdown()
+        if self.profiler.enabled:
+            self.profiler.export_chrome_trace('frame_trace.json')
     
     def touch_began(self, touch):
-        if self.game_over and not self.waiting_for_input:
-            if not hasattr(self, 'high_scores_shown'):
-                # If high scores aren't shown yet, show them instead of resetting
-                self.high_scores_shown = True
-                self.handle_high_score()
-            else:
-                # Otherwise reset the game
-                self.reset_game()
+        if self.state == PAUSED:
+            if self.paused_by_user:
+                self.resume_game()
+        elif self.state == PLAYING:
+            if touch is not None and self.hud.pause_hit(touch.location):
+                self.pause_game(by_user=True)
+        elif self.state == COUNTDOWN:
+            # If high scores aren't shown yet, show them instead of resetting
+            self.handle_high_score()
+        elif self.state == LEADERBOARD:
+            # Otherwise reset the game
+            self.reset_game()
     
     def touch_moved(self, touch):
-        if self.game_over:
+        if self.state != PLAYING or self.replay_player is not None or self.autoplayer is not None:
             return
-            
-        # Move player horizontally based on touch
-        new_x = touch.location.x
-        # Keep player within screen bounds
-        new_x = max(self.ball_radius, min(new_x, self.size.width - self.ball_radius))
-        self.player.position = (new_x, self.player.position.y)
+        self.touch_input.add(touch.location.x, touch.timestamp)
     
+    def touch_ended(self, touch):
+        self.touch_input.release()
+    
+    def apply_touches(self):
+        # One player update per frame, however many touches came in. The
+        # engine (and so collision and replays) gets the newest real touch;
+        # only the drawn ball is predicted ahead
+        r = self.engine.ball_radius
+        moved = self.touch_input.frame(r, self.engine.width - r)
+        if moved is not None:
+            true_x, shown_x = moved
+            self.engine.move_player(true_x)
+            self.player.position = (shown_x, self.engine.player_y)
+    
+    @profiled('show_game_over')
     def show_game_over(self):
-        try:
-            # First show the game over screen
-            overlay = SpriteNode(color='#00000099', 
-                               size=self.size, 
-                               position=(self.size.width/2, self.size.height/2))
-            self.add_child(overlay)
-            
-            LabelNode('Game Over!', 
-                    position=(self.size.width/2, self.size.height/2 + 50),
-                    font=('Helvetica', 30),
-                    parent=self)
-            
-            LabelNode(f'Final Score: {int(self.score)}',
-                    position=(self.size.width/2, self.size.height/2),
-                    font=('Helvetica', 20),
-                    parent=self)
-            
-            LabelNode(f'Level Reached: {self.level}',
-                    position=(self.size.width/2, self.size.height/2 - 30),
-                    font=('Helvetica', 20),
-                    parent=self)
-            
-            # Add countdown indicator as a dynamic label with 5 second countdown
-            self.countdown_label = LabelNode('Continuing in 5 seconds...',
-                    position=(self.size.width/2, self.size.height/2 - 60),
-                    font=('Helvetica', 16),
-                    parent=self)
-            
-            # Record when game over screen was shown and set initial countdown value
-            self.game_over_time = self.t
-            self.countdown_value = 5  # Changed from 15 to 5
-            
-            # Play game over sound
-            if sound_available:
-                try:
-                    sound.play_effect('game:Error')
-                except Exception:
-                    pass  # Continue if sound fails
-            
-        except Exception as e:
-            print(f"Error showing game over: {e}")
+        self.state = COUNTDOWN
+        self.game_over_time = self.t  # Record when game over screen was shown
+        self.game_over_screen.show(self.engine.score, self.engine.level, 5)  # Changed from 15 to 5
+        
+        # Play game over sound
+        with self.profiler.scope('audio'):
+            self.audio.play('game_over', duck=False)
     
     def handle_high_score(self):
         """Handle high score after game over screen is displayed"""
-        final_score = int(self.score)
-        is_high_score = self.check_high_score(final_score)
+        final_score = int(self.engine.score)
+        if self.autoplayer is not None or self.replay_player is not None:
+            # Bot games and replays never go on the board
+            self.display_high_scores(self.high_scores.top())
+            return
+        is_high_score = self.high_scores.qualifies(final_score)
         
         # Get player name if it's a high score
         player_name = "Anonymous"
+        console = optional_module('console', CONSOLE_MISSING)  # Usually imported at startup
         
-        if is_high_score and console_available:
-            # Run name input in a separate thread to avoid blocking
-            def name_input_thread():
-                try:
-                    self.waiting_for_input = True
-                    name = console.input_alert(
-                        "New High Score!",
-                        f"Your score: {final_score}. Enter your name:",
-                        "",
-                        "Save"
-                    )
-                    # Process results on the main thread
-                    self.finalize_high_score(final_score, name)
-                except Exception as e:
-                    print(f"Error getting player name: {e}")
-                    # Show scores even if there was an error
-                    self.display_high_scores(self.load_high_scores())
-                finally:
-                    self.waiting_for_input = False
+        if is_high_score and console is not None:
+            # The name prompt blocks, so run it on a worker; the callbacks
+            # below run on the main thread from update()
+            def name_entered(name):
+                self.finalize_high_score(final_score, name)
+            
+            def name_failed(e):
+                print(f"Error getting player name: {e}")
+                # Show scores even if there was an error
+                self.display_high_scores(self.high_scores.top())
             
-            # Start the thread
-            t = threading.Thread(target=name_input_thread)
-            t.daemon = True
-            t.start()
+            self.state = SCORE_ENTRY
+            self.tasks.submit(console.input_alert,
+                              "New High Score!",
+                              f"Your score: {final_score}. Enter your name:",
+                              "",
+                              "Save",
+                              on_done=name_entered, on_error=name_failed)
         else:
             # No high score or console not available
-            self.display_high_scores(self.load_high_scores())
+            self.display_high_scores(self.high_scores.top())
     
     def finalize_high_score(self, score, name):
         """Update high scores and display results after name input"""
-        high_scores = self.update_high_scores(score, name)
+        high_scores = self.high_scores.add(score, name)
+        if self.leaderboard is not None:
+            self.leaderboard.submit(score, name)
         self.display_high_scores(high_scores)
     
     def display_high_scores(self, high_scores):
         # Display high scores on game over screen
-        y_position = self.size.height/2 - 80
-        LabelNode('Top Scores:',
-                position=(self.size.width/2, y_position),
-                font=('Helvetica', 18),
-                parent=self)
-        y_position -= 30
-        
-        for i, entry in enumerate(high_scores[:5]):
-            emoji = '⭐️' if i == 0 else f'{i+1}.'
-            text = f"{emoji} {entry['score']} - {entry['name']} ({entry['date']})"
-            LabelNode(text,
-                    position=(self.size.width/2, y_position),
-                    font=('Helvetica', 14),
-                    parent=self)
-            y_position -= 25
-        
-        LabelNode('Tap to Restart',
-                position=(self.size.width/2, y_position),
-                font=('Helvetica', 18),
-                parent=self)
+        self.state = LEADERBOARD
+        self.local_scores = high_scores
+        self.game_over_screen.show_scores(high_scores, self.world_scores)
+    
+    def world_scores_ready(self, board):
+        self.world_scores = board
+        if self.state == LEADERBOARD:
+            self.game_over_screen.show_scores(self.local_scores, board)
 
 # Run the game
 if __name__ == '__main__':
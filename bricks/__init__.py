@@ -0,0 +1,7 @@
+# coding: utf-8
+"""Support package for the Falling Bricks game.
+
+Everything in here runs on plain Python 3 so it can be used off-device;
+only Falling-bricks.py and the hud module talk to Pythonista's scene,
+sound and console modules directly.
+"""
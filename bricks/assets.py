@@ -0,0 +1,80 @@
+# coding: utf-8
+"""Texture cache with one-time fallback resolution.
+
+Every texture name is loaded at most once. A name that fails to load is
+remembered as missing, so callers get their fallback color straight away
+instead of raising and catching an exception on every sprite. Textures
+are kept in LRU order. Pinned ones (player, background) are never
+evicted. Level-themed ones (brick colors) are evicted once more than
+`capacity` of them are cached.
+
+Like NodePool this knows nothing about scene: the caller passes in the
+loader, normally scene.Texture.
+"""
+import collections
+
+# Brick texture per color index, with a plain color for when it's missing
+BRICK_TEXTURES = ['pzl:Red8', 'pzl:Green8', 'pzl:Yellow8', 'pzl:Purple8', 'pzl:Blue8']
+BRICK_FALLBACK_COLORS = ['#ff0000', '#00ff00', '#ffff00', '#800080', '#0000ff']
+
+
+class AssetCache:
+    def __init__(self, load, capacity=3):
+        self.load = load
+        self.capacity = capacity  # Unpinned textures kept before evicting
+        self.textures = collections.OrderedDict()  # name -> texture, LRU first
+        self.pinned = set()
+        self.missing = set()  # Names that failed to load; never retried
+        self.loads = 0
+        self.evictions = 0
+
+    def texture(self, name, pin=False):
+        """Texture for `name`, or None if it can't be loaded"""
+        texture = self.textures.get(name)
+        if texture is not None:
+            self.textures.move_to_end(name)
+            return texture
+        if name in self.missing:
+            return None
+        self.loads += 1
+        try:
+            texture = self.load(name)
+        except Exception as e:
+            print(f"Asset {name!r} not available, using fallback: {e}")
+            self.missing.add(name)
+            return None
+        self.textures[name] = texture
+        if pin:
+            self.pinned.add(name)
+        else:
+            self.evict()
+        return texture
+
+    def look(self, name, fallback_color, pin=False):
+        """(texture, color) for a sprite: tinted white if the texture
+        loaded, otherwise no texture and `fallback_color`"""
+        texture = self.texture(name, pin)
+        return (texture, 'white') if texture is not None else (None, fallback_color)
+
+    def brick_look(self, color_index):
+        return self.look(BRICK_TEXTURES[color_index], BRICK_FALLBACK_COLORS[color_index])
+
+    def prewarm_brick(self, color_index):
+        """Load a brick texture ahead of the level that first needs it"""
+        self.texture(BRICK_TEXTURES[color_index])
+
+    def evict(self):
+        unpinned = len(self.textures) - len(self.pinned)
+        if unpinned <= self.capacity:
+            return
+        for name in list(self.textures):
+            if name not in self.pinned:
+                del self.textures[name]
+                self.evictions += 1
+                unpinned -= 1
+                if unpinned <= self.capacity:
+                    break
+
+    def stats(self):
+        return {'cached': len(self.textures), 'loads': self.loads,
+                'missing': len(self.missing), 'evictions': self.evictions}
@@ -0,0 +1,243 @@
+# coding: utf-8
+"""Sound effects and music.
+
+AudioManager wraps a backend with Pythonista's sound module API:
+load_effect, play_effect, stop_effect, set_volume and Player. It adds:
+
+- preload(): decode every effect up front, on a worker, so the first play
+  mid-game doesn't pay for it
+- a voice pool: at most `max_voices` effects at once, the oldest is cut
+  off to make room
+- rate limiting: an effect re-triggered within `min_interval` seconds of
+  its last play is dropped
+- music that is paused and resumed rather than rebuilt, and ducked under
+  effects with a fade driven from update(), so no call ever blocks
+
+Without the sound module (headless, Linux) NullBackend stands in and
+counts every call, so the audio paths can be exercised and checked:
+
+    python -m bricks.audio    # scripted self-check against NullBackend
+"""
+import collections
+import sys
+
+# Effect key -> sound asset
+EFFECTS = {
+    'milestone': 'digital:PowerUp9',
+    'set_cleared': 'digital:PowerUp7',
+    'game_over': 'game:Error',
+}
+
+
+class NullPlayer:
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self.volume = 1.0
+        self.number_of_loops = 0
+        self.current_time = 0.0
+        self.playing = False
+
+    def play(self):
+        self.backend.calls['Player.play'] += 1
+        self.playing = True
+
+    def pause(self):
+        self.backend.calls['Player.pause'] += 1
+        self.playing = False
+
+    def stop(self):
+        self.backend.calls['Player.stop'] += 1
+        self.playing = False
+
+
+class NullBackend:
+    """Silent stand-in for the sound module; counts calls in `calls`"""
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.next_effect = 0
+
+    def set_volume(self, volume):
+        self.calls['set_volume'] += 1
+
+    def set_honors_silent_switch(self, flag):
+        self.calls['set_honors_silent_switch'] += 1
+
+    def load_effect(self, name):
+        self.calls['load_effect'] += 1
+
+    def play_effect(self, name, volume=1.0, pitch=1.0, pan=0.0, looping=False):
+        self.calls['play_effect'] += 1
+        self.next_effect += 1
+        return self.next_effect
+
+    def stop_effect(self, effect):
+        self.calls['stop_effect'] += 1
+
+    def Player(self, path):
+        self.calls['Player'] += 1
+        return NullPlayer(self, path)
+
+
+class AudioManager:
+    def __init__(self, backend, effects=EFFECTS, max_voices=4, min_interval=0.1,
+                 voice_time=1.0, duck_volume=0.4, duck_hold=0.6, fade_rate=2.0):
+        self.backend = backend
+        self.effects = effects
+        self.max_voices = max_voices
+        self.min_interval = min_interval  # Seconds before the same effect can replay
+        self.voice_time = voice_time  # Assumed effect length; voices free up after it
+        self.duck_volume = duck_volume  # Music volume factor while ducked
+        self.duck_hold = duck_hold
+        self.fade_rate = fade_rate  # Volume factor change per second
+        self.voices = collections.deque()  # (start time, effect handle), oldest first
+        self.last_played = {}
+        self.now = 0.0
+        self.music = None
+        self.music_volume = 1.0
+        self.music_playing = False
+        self.duck_until = 0.0
+        self.level = 1.0  # Current music volume factor (1 = not ducked)
+        self.played = 0
+        self.dropped = 0  # Rate-limited triggers
+        self.stolen = 0  # Voices cut off for a new effect
+
+    def configure(self, volume, honors_silent_switch=False):
+        self.backend.set_volume(volume)
+        self.backend.set_honors_silent_switch(honors_silent_switch)
+
+    def preload(self):
+        """Decode every effect now (blocking; run on a worker)"""
+        for name in self.effects.values():
+            try:
+                self.backend.load_effect(name)
+            except Exception as e:
+                print(f"Could not preload sound {name!r}: {e}")
+
+    def open_music(self, path, volume=1.0, loops=-1):
+        """Create the music player (blocking; run on a worker)"""
+        self.music = self.backend.Player(path)
+        self.music.number_of_loops = loops
+        self.music_volume = volume
+        self.music.volume = volume * self.level
+
+    def play(self, key, volume=1.0, duck=True):
+        """Play effect `key` unless it's rate limited; returns True if played"""
+        last = self.last_played.get(key)
+        if last is not None and self.now - last < self.min_interval:
+            self.dropped += 1
+            return False
+        voices = self.voices
+        while voices and self.now - voices[0][0] >= self.voice_time:
+            voices.popleft()
+        try:
+            if len(voices) >= self.max_voices:
+                self.backend.stop_effect(voices.popleft()[1])
+                self.stolen += 1
+            voices.append((self.now, self.backend.play_effect(self.effects[key], volume)))
+        except Exception as e:
+            print(f"Sound effect {key!r} failed: {e}")
+            return False
+        self.last_played[key] = self.now
+        self.played += 1
+        if duck and self.music_playing:
+            self.duck_until = self.now + self.duck_hold
+        return True
+
+    def play_music(self):
+        if self.music is not None and not self.music_playing:
+            try:
+                self.music.play()
+                self.music_playing = True
+            except Exception as e:
+                print(f"Music failed: {e}")
+
+    def pause_music(self):
+        """Pause, keeping the position for play_music()"""
+        if self.music is not None and self.music_playing:
+            try:
+                self.music.pause()
+            except Exception:
+                pass
+            self.music_playing = False
+
+    def update(self, now):
+        """Advance the clock to `now` (seconds) and step the ducking fade"""
+        dt = max(0.0, now - self.now)
+        self.now = now
+        if self.music is None or not self.music_playing:
+            return
+        target = self.duck_volume if now < self.duck_until else 1.0
+        if self.level != target:
+            step = self.fade_rate * dt
+            if self.level > target:
+                self.level = max(target, self.level - step)
+            else:
+                self.level = min(target, self.level + step)
+            self.music.volume = self.music_volume * self.level
+
+    def stats(self):
+        return {'played': self.played, 'dropped': self.dropped, 'stolen': self.stolen,
+                'voices': len(self.voices)}
+
+
+def self_check():
+    """Drive an AudioManager on NullBackend through a scripted session;
+    returns (name, passed) per check, the manager and the backend"""
+    backend = NullBackend()
+    audio = AudioManager(backend)
+    checks = []
+    audio.configure(0.5)
+    audio.preload()
+    checks.append(('preload decodes every effect', backend.calls['load_effect'] == len(EFFECTS)))
+
+    audio.open_music('music.m4a', volume=0.8)
+    audio.play_music()
+    audio.play_music()
+    checks.append(('music starts once', backend.calls['Player.play'] == 1))
+
+    audio.update(1.0)
+    audio.play('milestone')
+    audio.play('milestone')
+    checks.append(('re-trigger is rate limited', audio.played == 1 and audio.dropped == 1))
+
+    for i in range(1, audio.max_voices + 1):
+        audio.update(1.0 + i * 1.5 * audio.min_interval)
+        audio.play('milestone')
+    checks.append(('oldest voice is stolen', audio.stolen == 1 and backend.calls['stop_effect'] == 1
+                   and len(audio.voices) == audio.max_voices))
+
+    now = audio.now
+    for _ in range(10):
+        now += 0.05
+        audio.update(now)
+    checks.append(('music ducks under effects', audio.level == audio.duck_volume))
+    for _ in range(100):
+        now += 0.05
+        audio.update(now)
+    checks.append(('music fades back up', audio.level == 1.0
+                   and audio.music.volume == audio.music_volume))
+
+    audio.pause_music()
+    audio.play_music()
+    checks.append(('pause keeps the player', backend.calls['Player'] == 1
+                   and backend.calls['Player.pause'] == 1 and backend.calls['Player.play'] == 2))
+    return checks, audio, backend
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Self-check of the audio paths on NullBackend')
+    parser.parse_args(argv)
+
+    checks, audio, backend = self_check()
+    for name, passed in checks:
+        print(f"{'ok  ' if passed else 'FAIL'} {name}")
+    print(f"stats: {audio.stats()}")
+    print(f"backend calls: {dict(sorted(backend.calls.items()))}")
+    return 0 if all(passed for _, passed in checks) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
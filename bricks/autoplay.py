@@ -0,0 +1,324 @@
+# coding: utf-8
+"""Lookahead autoplayer for soak tests.
+
+Autoplayer steers the ball from the live brick set, like a player who can
+see the whole screen: it never looks at bricks that haven't spawned yet.
+It moves the ball at finger speed. In the scene its positions go into the
+same TouchInput buffer as a finger's, once per frame, and reach the engine
+through apply_touches() like touches do.
+
+Planning works on a grid: the ball's x range is split into columns
+`spacing` units apart, and the next `horizon` seconds into slices
+`slice_dt` long.
+
+- Each brick's fall is projected onto the ball's row once, giving a
+  bitmask per slice of the columns it sweeps through.
+- Reachability is memoized per slice, back to front: safe[k] is the mask
+  of columns from which some path, moving at most `speed`, lasts the whole
+  horizon. A dead end is then a single bit test.
+- A beam search over the safe columns keeps the `beam` best states per
+  slice, one per column. It scores paths for clearance from bricks, little
+  movement and staying near the middle.
+
+Projection and search share the per-frame `budget`. A projection that
+runs out of time carries on from the same brick next frame, and the bot
+keeps its old target meanwhile. A search that runs out uses the best path
+so far. The bot replans every `replan` seconds, since new bricks keep
+arriving.
+
+Set AUTOPLAY = True in Falling-bricks.py to watch it on-device. Headless,
+it plays the engine alone or, with --scene, the whole scene on scene_stub:
+
+    python -m bricks.autoplay --minutes 120 --difficulty storm
+    python -m bricks.autoplay --minutes 30 --scene
+"""
+import argparse
+import heapq
+import math
+import sys
+import time
+
+from .engine import FIXED_DT, GameEngine
+
+
+def dilate(mask, steps, within):
+    """Grow `mask` by up to `steps` columns each way without leaving `within`"""
+    for _ in range(steps):
+        grown = (mask | (mask << 1) | (mask >> 1)) & within
+        if grown == mask:
+            break
+        mask = grown
+    return mask
+
+
+class Autoplayer:
+    def __init__(self, speed=900, spacing=3, slice_dt=0.05, horizon=0.8, beam=6, branch=5,
+                 margin=0.5, clearance=4, budget=0.002, replan=0.05):
+        self.speed = speed  # Ball speed in units/s, about a quick finger
+        self.spacing = spacing  # Units between columns
+        self.slice_dt = slice_dt
+        self.slices = max(1, int(round(horizon / slice_dt)))
+        self.beam = beam
+        self.branch = branch  # Moves tried per state and slice
+        self.margin = margin  # Extra units kept between ball and bricks
+        self.clearance = clearance  # Columns from a brick that still count as close
+        self.budget = budget  # Seconds of planning per call
+        self.replan = replan  # Seconds between plans
+        self.reach = max(1, int(speed * slice_dt / spacing))  # Columns per slice
+        self.width = None
+        self.target = None
+        self.since_plan = 0.0
+        self.scan = None  # (blocked, next brick, engine time) of an unfinished projection
+        self.plans = 0
+        self.truncated = 0  # Projections and searches cut short by the budget
+        self.stuck = 0  # Plans where no path survived the horizon
+        self.plan_time = 0.0
+        self.worst = 0.0  # Longest plan, seconds
+
+    def resize(self, width, ball_radius):
+        self.width = width
+        self.ball_radius = ball_radius
+        self.left = ball_radius
+        self.columns = max(1, int((width - 2 * ball_radius) // self.spacing) + 1)
+        self.full = (1 << self.columns) - 1
+
+    def column_x(self, column):
+        return self.left + column * self.spacing
+
+    def column_of(self, x):
+        return max(0, min(self.columns - 1, int(round((x - self.left) / self.spacing))))
+
+    def __call__(self, engine, dt):
+        """The x to move the ball to this frame (`dt` seconds long)"""
+        if engine.width != self.width or engine.ball_radius != self.ball_radius:
+            self.resize(engine.width, engine.ball_radius)
+            self.target = None
+            self.scan = None
+        self.since_plan += dt
+        if self.target is None or self.since_plan >= self.replan:
+            column = self.plan(engine)
+            if column is not None:
+                self.target = self.column_x(column)
+                self.since_plan = 0.0
+            elif self.target is None:
+                self.target = engine.player_x
+        x = engine.player_x
+        step = self.speed * dt
+        if abs(self.target - x) <= step:
+            return self.target
+        return x + (step if self.target > x else -step)
+
+    def blocked_masks(self, engine, deadline=None):
+        """Per slice, the columns some brick sweeps through at the ball's row.
+
+        If `deadline` passes first, returns None and the next call resumes
+        at the next brick. Each brick is projected from where it was when
+        the scan began, and the masks are moved on to the current time at
+        the end. A removal can swap an unscanned brick into a scanned slot;
+        it's missed until the next scan.
+        """
+        store = engine.store
+        if self.scan is None:
+            self.scan = ([0] * self.slices, 0, engine.time)
+        blocked, begin, began = self.scan
+        late = engine.time - began  # Fall since the scan began
+        slices = self.slices
+        slice_dt = self.slice_dt
+        spacing = self.spacing
+        left = self.left
+        last = self.columns - 1
+        r = engine.ball_radius + self.margin
+        row_top = engine.player_y + r
+        row_bottom = engine.player_y - r
+        xs, ys, speeds = store.x, store.y, store.speed
+        half_ws, half_hs = store.half_w, store.half_h
+        for i in range(begin, store.count):
+            if deadline is not None and i > begin and not i & 31 and time.perf_counter() > deadline:
+                self.scan = (blocked, i, began)
+                return None
+            speed = speeds[i]
+            y = ys[i] + speed * late if speed > 0 else ys[i]
+            top = y + half_hs[i]
+            if top < row_bottom:
+                continue  # Already below the ball
+            bottom = y - half_hs[i]
+            if speed > 0:
+                # Slices from when its bottom reaches the ball until its top clears it
+                first = max(0, int((bottom - row_top) / speed / slice_dt))
+                end = min(slices - 1, int((top - row_bottom) / speed / slice_dt))
+            elif bottom <= row_top:
+                first, end = 0, slices - 1  # Parked across the ball's row
+            else:
+                continue
+            if first > end:
+                continue
+            hw = half_ws[i] + r
+            # Columns strictly inside the brick's reach
+            c0 = max(0, math.floor((xs[i] - hw - left) / spacing) + 1)
+            c1 = min(last, math.ceil((xs[i] + hw - left) / spacing) - 1)
+            if c0 > c1:
+                continue
+            bits = ((1 << (c1 - c0 + 1)) - 1) << c0
+            for k in range(first, end + 1):
+                blocked[k] |= bits
+        self.scan = None
+        if late > 0:
+            # Drop the slices that have gone by. A partly elapsed one is
+            # merged into the next, and the horizon's end keeps its last mask
+            gone = min(slices, int(late / slice_dt))
+            blocked = blocked[gone:] + blocked[-1:] * gone
+            if late > gone * slice_dt:
+                blocked = [a | b for a, b in zip(blocked, blocked[1:] + blocked[-1:])]
+        return blocked
+
+    def safe_masks(self, blocked):
+        """safe[k]: columns at the start of slice k from which a path lasts the horizon"""
+        full = self.full
+        safe = [0] * (self.slices + 1)
+        safe[-1] = full
+        for k in range(self.slices - 1, -1, -1):
+            free = full & ~blocked[k]
+            safe[k] = dilate(safe[k + 1] & free, self.reach, free)
+        return safe
+
+    def plan(self, engine):
+        """Column to head for over the next slice, or None if projecting the
+        bricks ran out of budget"""
+        start = time.perf_counter()
+        deadline = start + self.budget
+        blocked = self.blocked_masks(engine, deadline)
+        if blocked is None:
+            self.truncated += 1
+            self.plan_time += time.perf_counter() - start
+            return None
+        safe = self.safe_masks(blocked)
+        origin = self.column_of(engine.player_x)
+        middle = (self.columns - 1) / 2
+        full = self.full
+        choice = None
+        if not safe[0] >> origin & 1:
+            # No path survives the horizon from here: go for the nearest
+            # column that survives longest
+            self.stuck += 1
+            for k in range(self.slices, 0, -1):
+                if safe[k]:
+                    choice = min((c for c in range(self.columns) if safe[k] >> c & 1),
+                                 key=lambda c: abs(c - origin))
+                    break
+        else:
+            beam = {origin: (0.0, origin)}  # Column -> (score, first column)
+            for k in range(self.slices):
+                if k and time.perf_counter() > deadline:
+                    self.truncated += 1
+                    break
+                walls = (full & blocked[k]) | (1 << self.columns)  # Sentinel past the edge
+                close = dilate(blocked[k], self.clearance, full)
+                ahead = safe[k + 1]
+                states = {}
+                for column, (score, first) in beam.items():
+                    # The clear run around this column, cut to one slice's travel
+                    below = walls & ((1 << column) - 1)
+                    above = walls >> column
+                    lo = max(below.bit_length(), column - self.reach)
+                    hi = min(column + (above & -above).bit_length() - 2, column + self.reach)
+                    moves = ahead & (((1 << (hi - lo + 1)) - 1) << lo)
+                    if not moves:
+                        continue
+                    # A spread of moves over the run, plus its outermost safe columns
+                    tos = {moves.bit_length() - 1, (moves & -moves).bit_length() - 1}
+                    for i in range(self.branch):
+                        to = lo + (hi - lo) * i // (self.branch - 1)
+                        if moves >> to & 1:
+                            tos.add(to)
+                    for to in tos:
+                        s = (score - 0.05 * abs(to - column) - 0.2 * abs(to - middle) / self.columns
+                             - (close >> to & 1))
+                        if to not in states or s > states[to][0]:
+                            states[to] = (s, to if k == 0 else first)
+                if not states:
+                    break
+                beam = dict(heapq.nlargest(self.beam, states.items(), key=lambda item: item[1][0]))
+            choice = max(beam.values())[1]
+        elapsed = time.perf_counter() - start
+        self.plans += 1
+        self.plan_time += elapsed
+        self.worst = max(self.worst, elapsed)
+        return origin if choice is None else choice
+
+    def stats(self):
+        return {'plans': self.plans, 'truncated': self.truncated, 'stuck': self.stuck,
+                'mean_ms': self.plan_time / max(1, self.plans) * 1000, 'worst_ms': self.worst * 1000}
+
+
+def soak_engine(args, bot):
+    """Play the engine alone for --minutes of game time; returns finished games"""
+    engine = GameEngine(args.width, args.height, difficulty=args.difficulty)
+    engine.reset(seed=args.seed)
+    games = []
+    ticks = int(args.minutes * 60 / args.dt)
+    for _ in range(ticks):
+        engine.move_player(bot(engine, args.dt))
+        engine.step(args.dt)
+        if engine.game_over:
+            games.append((engine.level, int(engine.score), engine.death_cause))
+            engine.reset()
+    return games
+
+
+def soak_scene(args, bot):
+    """Play the full scene on scene_stub; game overs run through the UI"""
+    from . import scene_stub
+    module = scene_stub.load_game()
+    module.RECORD_REPLAY = False
+    module.TELEMETRY = False
+    module.SNAPSHOT_FILE = None
+    module.AUTOPLAY = True
+    module.DIFFICULTY = args.difficulty
+    game = scene_stub.start_game(module, (args.width, args.height))
+    game.autoplayer = bot
+    game.engine.reset(seed=args.seed)
+    games = []
+    try:
+        for _ in range(int(args.minutes * 60 / args.dt)):
+            over = game.engine.game_over
+            scene_stub.step(game, args.dt)
+            if game.engine.game_over and not over:
+                games.append((game.engine.level, int(game.engine.score), game.engine.death_cause))
+    finally:
+        game.stop()
+    return games
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Let the lookahead bot play Falling Bricks')
+    parser.add_argument('--minutes', type=float, default=10, help='game time to play')
+    parser.add_argument('--difficulty', default='normal')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--width', type=float, default=390)
+    parser.add_argument('--height', type=float, default=844)
+    parser.add_argument('--dt', type=float, default=FIXED_DT, help='seconds per step/frame')
+    parser.add_argument('--budget-ms', type=float, default=2.0, help='planning budget per frame')
+    parser.add_argument('--scene', action='store_true', help='drive the whole scene, not just the engine')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print every game')
+    args = parser.parse_args(argv)
+
+    bot = Autoplayer(budget=args.budget_ms / 1000)
+    start = time.perf_counter()
+    games = soak_scene(args, bot) if args.scene else soak_engine(args, bot)
+    elapsed = time.perf_counter() - start
+    if args.verbose:
+        for i, (level, score, death) in enumerate(games, 1):
+            print(f"game {i}: level {level}, score {score}, hit by {death} brick")
+    print(f"{args.minutes:g} game minutes in {elapsed:.1f}s: {len(games)} games")
+    if games:
+        levels = sorted(level for level, _, _ in games)
+        print(f"levels: best {levels[-1]}, median {levels[len(levels) // 2]}; "
+              f"best score {max(score for _, score, _ in games)}")
+    stats = bot.stats()
+    print(f"plans: {stats['plans']}, mean {stats['mean_ms']:.3f} ms, worst {stats['worst_ms']:.2f} ms, "
+          f"over budget {stats['truncated']}, no way out {stats['stuck']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
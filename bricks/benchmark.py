@@ -0,0 +1,299 @@
+# coding: utf-8
+"""Frame-time benchmarks for the game loop.
+
+Runs the real FallingBricksGame headless on top of scene_stub and drives
+it through scripted scenarios. Each scenario is run twice: once for
+timing, and once under tracemalloc for memory. It reports p50/p95/p99
+frame time, transient bytes allocated per frame, net heap blocks kept
+per frame, peak traced memory and the mean number of live bricks, which
+shows how loaded each scenario really is.
+
+    python -m bricks.benchmark --save bench_baseline.json
+    python -m bricks.benchmark --compare bench_baseline.json
+
+--compare exits non-zero if any scenario's p95 or peak memory regresses
+by more than --tolerance against the baseline. --replay FILE adds a
+'replay' scenario that renders a recorded session (see replay.py), for a
+fixed real-play workload.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from . import scene_stub
+
+FRAME_DT = 1 / 60
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# Scenarios: each gets a freshly set-up game and returns a per-frame
+# callable. The callable does any untimed preparation and returns the
+# function whose cost is measured for that frame.
+
+def level1_idle(game, rng):
+    """Level 1, player parked in the middle; restart on death"""
+    def frame():
+        if game.engine.game_over:
+            game.reset_game()
+        return game.update
+    return frame
+
+
+def level30_max_spawn(game, rng):
+    """Level 30 fall speed with the fastest spawns the game has ('storm' at
+    min_delay); a bot dodges, untimed, so the screen stays full"""
+    from .autoplay import Autoplayer
+    from .engine import DIFFICULTIES
+    engine = game.engine
+    engine.entry_times.update(DIFFICULTIES['storm'])  # Kept across resets
+    bot = Autoplayer()
+
+    def pin():
+        # No milestone boost: compounded to 1.33 ** 29 it culls bricks in
+        # the tick they spawn, leaving an empty screen
+        engine.level = 30
+        engine.milestone_boost = 1.0
+        engine.last_milestone = int(engine.score // engine.milestone_points)
+
+    def frame():
+        if engine.game_over:
+            game.reset_game()
+        pin()
+        engine.move_player(bot(engine, FRAME_DT))
+        return game.update
+    return frame
+
+
+def stress_500(game, rng):
+    """500 live bricks on screen, kept clear of the parked player"""
+    engine = game.engine
+    column = engine.ball_radius + 40
+
+    def top_up():
+        while engine.store.count < 500:
+            x = rng.uniform(30, engine.width - 30)
+            if abs(x - engine.player_x) < column:
+                continue
+            brick = engine.add_brick(x, rng.uniform(60, 240))
+            brick.store.y[brick.index] = brick.store.prev_y[brick.index] = rng.uniform(0, engine.height)
+
+    def frame():
+        if engine.game_over:
+            game.reset_game()
+        top_up()
+        return game.update
+    return frame
+
+
+def gameover_cycles(game, rng):
+    """Die, sit through the countdown and high scores, tap to restart"""
+    state = {'frames': 0}
+
+    def tap():
+        game.touch_began(None)
+        game.update()
+
+    def frame():
+        engine = game.engine
+        state['frames'] += 1
+        if not engine.game_over and state['frames'] % 30 == 0:
+            # Drop a brick straight onto the player
+            brick = engine.add_brick(engine.player_x, 0)
+            brick.store.y[brick.index] = engine.player_y
+        elif engine.game_over:
+            if game.state == 'leaderboard':
+                return tap
+            game.t += 1.0  # Skip through the countdown a second at a time
+        return game.update
+    return frame
+
+
+def replay_playback(game, rng):
+    """Render a recorded session (--replay), restarting it when it ends"""
+    def frame():
+        if game.engine.game_over:
+            game.reset_game()
+        return game.update
+    return frame
+
+
+SCENARIOS = {
+    'level1_idle': level1_idle,
+    'level30_max_spawn': level30_max_spawn,
+    'stress_500': stress_500,
+    'gameover_cycles': gameover_cycles,
+}
+
+
+def run_frames(module, scenario, frames, seed, measure, bricks=None):
+    """Drive one scenario; `measure(fn)` runs a frame and records its cost.
+
+    The live brick count after each frame is appended to `bricks`, if given.
+    """
+    random.seed(seed)
+    rng = random.Random(seed)
+    game = scene_stub.start_game(module)
+    frame = scenario(game, rng)
+    try:
+        for _ in range(frames):
+            fn = frame()
+            game.dt = FRAME_DT
+            game.t += FRAME_DT
+            measure(fn)
+            if bricks is not None:
+                bricks.append(game.engine.store.count)
+    finally:
+        game.stop()
+    return game
+
+
+def time_scenario(module, scenario, frames, seed):
+    times = []
+    bricks = []
+    clock = time.perf_counter
+
+    def measure(fn):
+        start = clock()
+        fn()
+        times.append(clock() - start)
+
+    gc.collect()
+    run_frames(module, scenario, frames, seed, measure, bricks)
+    times.sort()
+    return {
+        'p50_ms': percentile(times, 0.50) * 1000,
+        'p95_ms': percentile(times, 0.95) * 1000,
+        'p99_ms': percentile(times, 0.99) * 1000,
+        'max_ms': times[-1] * 1000,
+        'mean_bricks': sum(bricks) / len(bricks),
+    }
+
+
+def memory_scenario(module, scenario, frames, seed):
+    transient = []
+    blocks = []
+
+    def measure(fn):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start_blocks = sys.getallocatedblocks()
+        fn()
+        end_blocks = sys.getallocatedblocks()
+        _, peak = tracemalloc.get_traced_memory()
+        transient.append(peak - before)
+        blocks.append(end_blocks - start_blocks)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run_frames(module, scenario, frames, seed, measure)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'alloc_bytes_per_frame': sum(transient) / len(transient),
+        'net_blocks_per_frame': sum(blocks) / len(blocks),
+        'peak_kib': peak / 1024,
+    }
+
+
+def run(names, frames, seed, replay_path=None):
+    module = scene_stub.load_game()
+    module.RECORD_REPLAY = False
+    module.SNAPSHOT_FILE = None  # Never start from, or leave behind, a saved game
+    scenarios = [(name, SCENARIOS[name]) for name in names]
+    if replay_path:
+        scenarios.append(('replay', replay_playback))
+    results = {}
+    for name, scenario in scenarios:
+        module.REPLAY_FILE = replay_path if name == 'replay' else None
+        result = {'frames': frames}
+        result.update(time_scenario(module, scenario, frames, seed))
+        result.update(memory_scenario(module, scenario, frames, seed))
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages (empty if none)"""
+    failures = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ('p95_ms', 'peak_kib'):
+            limit = base[key] * (1 + tolerance)
+            if result[key] > limit:
+                failures.append(f"{name}: {key} {result[key]:.3f} > {limit:.3f} "
+                                f"(baseline {base[key]:.3f})")
+    return failures
+
+
+def report(results):
+    print(f"{'scenario':<20} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'B/frame':>9} {'blk/frame':>9} {'peak KiB':>9} {'bricks':>7}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['p99_ms']:>8.3f} "
+              f"{r['alloc_bytes_per_frame']:>9.0f} {r['net_blocks_per_frame']:>9.2f} {r['peak_kib']:>9.0f} "
+              f"{r.get('mean_bricks', 0):>7.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', metavar='PATH', help='write results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='fail on regressions against a baseline')
+    parser.add_argument('--replay', metavar='FILE', help='also benchmark rendering this replay')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed fractional regression for --compare (default 0.25)')
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}")
+
+    save = os.path.abspath(args.save) if args.save else None
+    replay_path = os.path.abspath(args.replay) if args.replay else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    # The game writes high_scores.json to the working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            results = run(args.scenarios or list(SCENARIOS), args.frames, args.seed, replay_path)
+        finally:
+            os.chdir(cwd)
+
+    report(results)
+    if save:
+        with open(save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {save}")
+    if baseline is not None:
+        failures = compare(results, baseline, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
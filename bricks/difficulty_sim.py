@@ -0,0 +1,353 @@
+# coding: utf-8
+"""Monte Carlo difficulty simulator.
+
+Plays many headless games per parameter set across a multiprocessing
+pool, with scripted player policies, to tune entry_times, the milestone
+boost and the milestone interval without a phone. Per-game results are
+streamed, chunk by chunk, to a compact columnar file. Per-level survival,
+brick density and death-cause summaries are printed at the end and
+written next to it as JSON.
+
+    python -m bricks.difficulty_sim --games 10000 --policy static,dodge \\
+        --min-delay 0.2,0.3 --boost 1.2,1.33 --out sweep.fbcol
+
+Every combination of the comma-separated values is simulated. Game seeds
+are derived from --seed, so a sweep is reproducible. Collision is swept,
+so --dt can trade a little timing accuracy for speed, e.g. --dt 0.05
+simulates at 20 Hz.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+
+from .autoplay import Autoplayer
+from .engine import FIXED_DT, GameEngine
+from .store import BrickStore
+
+DEATHS = ('timeout', 'set', 'random')
+
+# (name, array typecode) for each output column
+COLUMNS = (
+    ('params', 'H'),       # Index into the header's parameter sets
+    ('policy', 'B'),       # Index into the header's policy names
+    ('seed', 'Q'),
+    ('ticks', 'I'),
+    ('score', 'f'),
+    ('level', 'H'),        # Level reached
+    ('mean_bricks', 'f'),  # Average live bricks per tick
+    ('peak_bricks', 'H'),
+    ('death', 'B'),        # Index into DEATHS
+)
+
+MAGIC = b'FBCOL1\n'
+
+
+# Player policies: called once per tick, return the x to move to
+
+class StaticPolicy:
+    """Never moves"""
+
+    def __init__(self, rng, dt):
+        pass
+
+    def __call__(self, engine):
+        return engine.player_x
+
+
+class RandomWalkPolicy:
+    """Wanders at finger speed, picking a new target now and then"""
+
+    def __init__(self, rng, dt, speed=600):
+        self.rng = rng
+        self.step = speed * dt
+        self.target = None
+
+    def __call__(self, engine):
+        if self.target is None or abs(self.target - engine.player_x) < self.step:
+            self.target = self.rng.uniform(0, engine.width)
+        return engine.player_x + (self.step if self.target > engine.player_x else -self.step)
+
+
+class DodgePolicy:
+    """Greedy dodger with a short lookahead and human-ish reaction speed.
+
+    If any brick that will reach the ball's row within `lookahead` seconds
+    overlaps its column, move at up to `speed` units/s toward the nearest
+    x that is clear of all of them.
+    """
+
+    def __init__(self, rng, dt, speed=900, lookahead=0.35, margin=4):
+        self.step = speed * dt
+        self.lookahead = lookahead
+        self.margin = margin
+
+    def __call__(self, engine):
+        store = engine.store
+        px = engine.player_x
+        py = engine.player_y
+        r = engine.ball_radius + self.margin
+        blocked = []
+        for i in range(store.count):
+            y = store.y[i]
+            hh = store.half_h[i]
+            reach = store.speed[i] * self.lookahead
+            if y - hh - reach < py + r and y + hh > py - r:
+                hw = store.half_w[i] + r
+                blocked.append((store.x[i] - hw, store.x[i] + hw))
+        if not any(lo < px < hi for lo, hi in blocked):
+            return px
+        lo_edge = engine.ball_radius
+        hi_edge = engine.width - engine.ball_radius
+        candidates = [x for lo, hi in blocked for x in (lo, hi) if lo_edge <= x <= hi_edge]
+        candidates += [lo_edge, hi_edge]
+        free = [x for x in candidates if not any(lo < x < hi for lo, hi in blocked)]
+        if not free:
+            return px
+        target = min(free, key=lambda x: abs(x - px))
+        if abs(target - px) <= self.step:
+            return target
+        return px + (self.step if target > px else -self.step)
+
+
+class LookaheadPolicy:
+    """The autoplay bot, a near-best player. It runs with no time budget, so
+    its games stay reproducible."""
+
+    def __init__(self, rng, dt):
+        self.bot = Autoplayer(budget=float('inf'))
+        self.dt = dt
+
+    def __call__(self, engine):
+        return self.bot(engine, self.dt)
+
+
+POLICIES = {
+    'static': StaticPolicy,
+    'random_walk': RandomWalkPolicy,
+    'dodge': DodgePolicy,
+    'lookahead': LookaheadPolicy,
+}
+
+
+def play(engine, policy, seed, max_ticks, dt):
+    """Play one game; returns (row values, ticks spent at each level)"""
+    engine.reset(seed=seed)
+    level_ticks = [0]
+    peak = 0
+    total = 0
+    store = engine.store
+    while not engine.game_over and engine.tick < max_ticks:
+        engine.move_player(policy(engine))
+        engine.step(dt)
+        count = store.count
+        total += count
+        if count > peak:
+            peak = count
+        while len(level_ticks) < engine.level:
+            level_ticks.append(0)
+        level_ticks[engine.level - 1] += 1
+    death = DEATHS.index(engine.death_cause) if engine.game_over else 0
+    row = (engine.tick, engine.score, engine.level, total / max(1, engine.tick),
+           min(peak, 0xffff), death)
+    return row, level_ticks
+
+
+def run_chunk(task):
+    """Worker: play a chunk of games for one (params, policy) pair"""
+    param_index, params, policy_index, policy_name, seeds, max_ticks, dt = task
+    engine = GameEngine(params['width'], params['height'], difficulty=params['difficulty'])
+    engine.store = BrickStore(use_numpy=False)  # Scalar path is fastest at normal densities
+    engine.entry_times.update(min_delay=params['min_delay'], max_delay=params['max_delay'],
+                              speed_factor=params['speed_factor'])
+    engine.milestone_factor = params['boost']
+    engine.milestone_points = params['milestone']
+
+    columns = {name: array(code) for name, code in COLUMNS}
+    level_ticks = []  # Total ticks spent at each level, over the chunk
+    for seed in seeds:
+        policy = POLICIES[policy_name](random.Random(seed ^ 0x5eed), dt)
+        row, levels = play(engine, policy, seed, max_ticks, dt)
+        for (name, _), value in zip(COLUMNS, (param_index, policy_index, seed) + row):
+            columns[name].append(value)
+        for i, ticks in enumerate(levels):
+            if i == len(level_ticks):
+                level_ticks.append(0)
+            level_ticks[i] += ticks
+    return param_index, policy_index, columns, level_ticks
+
+
+class ColumnWriter:
+    """Streams chunks of columns: a JSON header, then per chunk a row count
+    followed by each column's raw array bytes"""
+
+    def __init__(self, path, header):
+        self.f = open(path, 'wb')
+        header = dict(header, columns=COLUMNS, byteorder=sys.byteorder)
+        data = json.dumps(header).encode('utf-8')
+        self.f.write(MAGIC + struct.pack('<I', len(data)) + data)
+        self.rows = 0
+
+    def write(self, columns):
+        rows = len(columns[COLUMNS[0][0]])
+        self.f.write(struct.pack('<I', rows))
+        for name, _ in COLUMNS:
+            columns[name].tofile(self.f)
+        self.rows += rows
+
+    def close(self):
+        self.f.close()
+
+
+def read_columns(path):
+    """Load a file written by ColumnWriter; returns (header, {name: array})"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('Not a difficulty_sim column file')
+        header = json.loads(f.read(struct.unpack('<I', f.read(4))[0]))
+        columns = {name: array(code) for name, code in header['columns']}
+        while True:
+            raw = f.read(4)
+            if not raw:
+                break
+            rows = struct.unpack('<I', raw)[0]
+            for name, _ in header['columns']:
+                columns[name].fromfile(f, rows)
+    if header['byteorder'] != sys.byteorder:
+        for column in columns.values():
+            column.byteswap()
+    return header, columns
+
+
+class Summary:
+    """Running aggregates for one (params, policy) pair"""
+
+    def __init__(self, dt):
+        self.dt = dt
+        self.games = 0
+        self.score = 0.0
+        self.bricks = 0.0
+        self.peak_bricks = 0
+        self.reached = []  # Games that reached level i + 1
+        self.level_ticks = []
+        self.deaths = [0] * len(DEATHS)
+
+    def add(self, columns, level_ticks):
+        for score, level, bricks, peak, death in zip(
+                columns['score'], columns['level'], columns['mean_bricks'],
+                columns['peak_bricks'], columns['death']):
+            self.games += 1
+            self.score += score
+            self.bricks += bricks
+            self.peak_bricks = max(self.peak_bricks, peak)
+            self.deaths[death] += 1
+            while len(self.reached) < level:
+                self.reached.append(0)
+            for i in range(level):
+                self.reached[i] += 1
+        for i, ticks in enumerate(level_ticks):
+            if i == len(self.level_ticks):
+                self.level_ticks.append(0)
+            self.level_ticks[i] += ticks
+
+    def to_dict(self):
+        games = max(1, self.games)
+        return {
+            'games': self.games,
+            'mean_score': self.score / games,
+            'mean_bricks': self.bricks / games,
+            'peak_bricks': self.peak_bricks,
+            'survival_by_level': [count / games for count in self.reached],
+            'mean_seconds_at_level': [ticks * self.dt / max(1, reached)
+                                      for ticks, reached in zip(self.level_ticks, self.reached)],
+            'deaths': dict(zip(DEATHS, self.deaths)),
+        }
+
+
+def parse_list(text, convert=float):
+    return [convert(value) for value in text.split(',') if value]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Monte Carlo difficulty sweeps')
+    parser.add_argument('--games', type=int, default=1000, help='games per combination')
+    parser.add_argument('--policy', default='dodge', help=f"comma list of {', '.join(POLICIES)}")
+    parser.add_argument('--difficulty', default='normal')
+    parser.add_argument('--min-delay', default='0.3')
+    parser.add_argument('--max-delay', default='2.0')
+    parser.add_argument('--speed-factor', default='0.9')
+    parser.add_argument('--boost', default='1.33', help='speed multiplier per milestone')
+    parser.add_argument('--milestone', default='20', help='points per milestone')
+    parser.add_argument('--size', default='390x844', help='screen size in points')
+    parser.add_argument('--dt', type=float, default=FIXED_DT, help='seconds per simulation step')
+    parser.add_argument('--max-seconds', type=float, default=300, help='cap on game length')
+    parser.add_argument('--chunk', type=int, default=200, help='games per worker task')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', default='difficulty_sweep.fbcol')
+    args = parser.parse_args(argv)
+
+    policies = parse_list(args.policy, str)
+    for name in policies:
+        if name not in POLICIES:
+            parser.error(f"unknown policy {name!r}")
+    width, height = (float(v) for v in args.size.split('x'))
+    params = [
+        {'difficulty': args.difficulty, 'width': width, 'height': height,
+         'min_delay': a, 'max_delay': b, 'speed_factor': c, 'boost': d, 'milestone': e}
+        for a, b, c, d, e in itertools.product(
+            parse_list(args.min_delay), parse_list(args.max_delay),
+            parse_list(args.speed_factor), parse_list(args.boost), parse_list(args.milestone, int))
+    ]
+    max_ticks = int(args.max_seconds / args.dt)
+
+    seeds = random.Random(args.seed)
+    tasks = []
+    for param_index, p in enumerate(params):
+        for policy_index, name in enumerate(policies):
+            game_seeds = [seeds.getrandbits(64) for _ in range(args.games)]
+            for start in range(0, args.games, args.chunk):
+                tasks.append((param_index, p, policy_index, name,
+                              game_seeds[start:start + args.chunk], max_ticks, args.dt))
+
+    summaries = {}
+    writer = ColumnWriter(args.out, {'params': params, 'policies': policies, 'deaths': DEATHS,
+                                     'dt': args.dt})
+    started = time.perf_counter()
+    try:
+        with multiprocessing.Pool(args.workers) as pool:
+            for param_index, policy_index, columns, level_ticks in \
+                    pool.imap_unordered(run_chunk, tasks):
+                writer.write(columns)
+                key = (param_index, policy_index)
+                summaries.setdefault(key, Summary(args.dt)).add(columns, level_ticks)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - started
+
+    report = []
+    for (param_index, policy_index), summary in sorted(summaries.items()):
+        entry = {'params': params[param_index], 'policy': policies[policy_index]}
+        entry.update(summary.to_dict())
+        report.append(entry)
+        p = params[param_index]
+        survival = entry['survival_by_level']
+        print(f"{policies[policy_index]:<12} min {p['min_delay']:<5} max {p['max_delay']:<5} "
+              f"factor {p['speed_factor']:<5} boost {p['boost']:<5} every {p['milestone']:<4} "
+              f"score {entry['mean_score']:7.1f}  bricks {entry['mean_bricks']:5.1f}  "
+              f"L2 {survival[1] if len(survival) > 1 else 0:.0%}  "
+              f"L5 {survival[4] if len(survival) > 4 else 0:.0%}  deaths {entry['deaths']}")
+    with open(args.out + '.summary.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"{writer.rows} games in {elapsed:.1f}s ({writer.rows / elapsed:.0f} games/s) -> {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,309 @@
+# coding: utf-8
+"""Headless simulation core for Falling Bricks.
+
+GameEngine owns all game state (bricks, player, score, level and the brick
+spawn timer) and never imports scene, sound or console. The Pythonista
+scene is a thin renderer that mirrors this state onto nodes through the
+EngineListener callbacks.
+
+Physics runs on a fixed timestep: advance() feeds real frame time into an
+accumulator and runs whole FIXED_DT ticks, so fall speed is the same at
+60 Hz, 120 Hz or with dropped frames. Speeds are in units per second.
+
+Brick state lives in a structure-of-arrays BrickStore (see store.py), so a
+tick moves, culls and collision-tests every brick in one batched pass.
+Brick formations come from a per-width table of safe layouts (see
+formations.py).
+
+Every game draws from its own random.Random seeded in reset(), and the
+player's x is quantized to PLAYER_QUANTUM. So the seed plus the player x
+at each tick fully determine a session, which is what replay.py records.
+"""
+import random
+
+from .formations import formation_table
+from .profiler import FrameProfiler
+from .store import BrickStore, swept_hit
+
+BRICK_WIDTH = 60
+BRICK_HEIGHT = 20
+BALL_RADIUS = 15
+PLAYER_Y = BALL_RADIUS + 10
+PLAYER_QUANTUM = 0.25  # Player x resolution; exact in binary, so replays are bit-exact
+
+FIXED_DT = 1 / 60  # Physics tick length in seconds
+MAX_STEPS_PER_FRAME = 5  # Catch-up cap; longer stalls are dropped, not replayed
+
+# Brick fall speed in units per second (was 2 + 0.2 * level px per 60 Hz frame)
+BASE_SPEED = 120
+LEVEL_SPEED = 12
+
+MILESTONE_POINTS = 20  # Level up every 20 points
+MILESTONE_BOOST = 1.33  # Speed multiplier applied at each milestone
+
+# Brick entry timing per difficulty. 'storm' keeps the same fall speeds but
+# spawns random bricks many times faster, for a much denser screen.
+DIFFICULTIES = {
+    'normal': {
+        'min_delay': 0.3,         # Minimum delay between bricks
+        'max_delay': 2.0,         # Maximum delay between bricks
+        'speed_factor': 0.9       # Speed increases by 10% per level
+    },
+    'storm': {
+        'min_delay': 0.04,
+        'max_delay': 0.3,
+        'speed_factor': 0.9
+    },
+}
+
+
+class EngineListener:
+    """No-op callbacks; renderers override the ones they care about."""
+
+    def on_brick_added(self, brick):
+        pass
+
+    def on_brick_removed(self, brick):
+        pass
+
+    def on_level_up(self, level, milestone):
+        """`milestone` is True for score milestones, False for cleared sets."""
+        pass
+
+    def on_game_over(self):
+        pass
+
+
+class GameEngine:
+    def __init__(self, width, height, listener=None, difficulty='normal'):
+        self.width = width
+        self.height = height
+        self.listener = listener if listener is not None else EngineListener()
+        self.profiler = FrameProfiler()  # Disabled unless the renderer swaps in its own
+        self.recorder = None  # Optional replay.ReplayRecorder
+        self.seed = None
+        self.rng = random.Random()
+        self.milestone_points = MILESTONE_POINTS
+        self.milestone_factor = MILESTONE_BOOST
+        self.death_cause = None  # Kind of the brick that ended the game
+        self.spawn_floor = 0  # Minimum seconds between random bricks (quality governor)
+        self.ball_radius = BALL_RADIUS
+        self.store = BrickStore()
+
+        self.score = 0
+        self.game_over = False
+        self.time = 0  # Simulation clock, advanced by FIXED_DT per tick
+        self.tick = 0
+        self.accumulator = 0
+        self.alpha = 0
+        self.level = 1
+        self.last_milestone = 0  # Track the last 20-point milestone reached
+        self.milestone_boost = 1.0  # Speed multiplier that increases at milestones
+        self.player_x = width / 2
+        self.prev_player_x = self.player_x  # Where the last tick left the player
+        self.player_y = PLAYER_Y
+
+        # Brick entry timing system; next_time is set by reset()
+        self.difficulty = difficulty
+        self.entry_times = dict(DIFFICULTIES[difficulty], next_time=0)
+
+    @property
+    def bricks(self):
+        """Live Brick handles, in storage order"""
+        return self.store.bricks
+
+    @property
+    def formations(self):
+        """Formation table for the current width (cached, see formations.py)"""
+        # Ball's required clearance (diameter)
+        return formation_table(self.width, BRICK_WIDTH, self.ball_radius * 2 + 5)
+
+    def reset(self, seed=None):
+        """Start a new game, seeded with `seed` (a fresh random one if None)"""
+        self.clear_bricks()
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.rng.seed(self.seed)
+        self.score = 0
+        self.game_over = False
+        self.time = 0
+        self.tick = 0
+        self.accumulator = 0
+        self.alpha = 0
+        self.level = 1
+        self.last_milestone = 0
+        self.milestone_boost = 1.0
+        self.death_cause = None
+        self.move_player(self.width / 2)
+        self.prev_player_x = self.player_x
+        self.player_y = PLAYER_Y
+        self.entry_times['next_time'] = 1.0  # Initial delay before first random brick
+        if self.recorder is not None:
+            self.recorder.begin(self)
+        self.generate_brick_set()
+
+    def set_spawn_floor(self, seconds):
+        """Cap the random brick rate; recorded so replays stay exact"""
+        seconds = round(seconds * 1e6) / 1e6  # Whole microseconds, as replays store it
+        if seconds != self.spawn_floor:
+            self.spawn_floor = seconds
+            if self.recorder is not None:
+                self.recorder.log_spawn_floor(self.tick, seconds)
+
+    def move_player(self, x):
+        """Move the player horizontally, keeping it within screen bounds"""
+        x = round(x / PLAYER_QUANTUM) * PLAYER_QUANTUM
+        self.player_x = max(self.ball_radius, min(x, self.width - self.ball_radius))
+
+    def brick_speed(self):
+        # Base speed, level modifier and milestone boost
+        return (BASE_SPEED + self.level * LEVEL_SPEED) * 1.33 * self.milestone_boost
+
+    def color_index(self, level=None):
+        """Brick color for `level` (default: the current level)"""
+        return ((self.level if level is None else level) - 1) % 5
+
+    def add_brick(self, x, speed, kind='random'):
+        brick = self.store.add(x, self.height + BRICK_HEIGHT, speed, self.color_index(),
+                               BRICK_WIDTH, BRICK_HEIGHT, kind)
+        self.listener.on_brick_added(brick)
+        return brick
+
+    def remove_brick(self, index):
+        self.listener.on_brick_removed(self.store.bricks[index])
+        self.store.remove(index)
+
+    def clear_bricks(self):
+        for brick in self.store.bricks:
+            self.listener.on_brick_removed(brick)
+        self.store.clear()
+
+    def add_random_brick(self):
+        """Add a single random brick at the top of the screen"""
+        x = self.rng.uniform(BRICK_WIDTH / 2, self.width - BRICK_WIDTH / 2)
+        self.add_brick(x, self.brick_speed())
+
+        # Schedule next brick entry with randomized timing
+        base_delay = self.entry_times['max_delay'] * (self.entry_times['speed_factor'] ** (self.level - 1))
+        base_delay = max(self.entry_times['min_delay'], base_delay)
+        random_delay = self.rng.uniform(base_delay * 0.5, base_delay * 1.5)
+        self.entry_times['next_time'] = self.time + max(random_delay, self.spawn_floor)
+
+    def generate_brick_set(self):
+        self.clear_bricks()
+
+        # Ensure at least 3 bricks
+        num_bricks = max(3, min(self.rng.randint(1, self.level + 2), 5))
+
+        # A precomputed layout with two safe passages, shifted at random
+        xs = self.formations.sample(self.rng, num_bricks)
+        speed = self.brick_speed()
+        for x in xs:
+            self.add_brick(x, speed, 'set')
+
+    def check_milestone(self):
+        """Check if player reached a 20-point milestone and apply boost if needed"""
+        current_milestone = int(self.score // self.milestone_points)
+        if current_milestone > self.last_milestone:
+            self.last_milestone = current_milestone
+            self.milestone_boost *= self.milestone_factor
+            self.level += 1
+            self.listener.on_level_up(self.level, True)
+
+    def check_collision(self, brick):
+        """Swept circle-rectangle test of `brick`'s last move against the
+        player's move since the last tick.
+
+        step() uses the batched BrickStore.advance() instead; this is for
+        one-off checks and tools.
+        """
+        return swept_hit(brick.x, brick.prev_y, brick.y, brick.width / 2, brick.height / 2,
+                         self.prev_player_x, self.player_x, self.player_y, self.ball_radius)
+
+    def advance(self, dt):
+        """Feed `dt` seconds of frame time into the fixed-timestep loop.
+
+        Returns the interpolation factor (0..1) between the last two ticks.
+        """
+        if self.game_over:
+            return self.alpha
+        self.accumulator += max(0, dt)
+        steps = 0
+        while self.accumulator >= FIXED_DT:
+            if steps == MAX_STEPS_PER_FRAME:
+                # Drop the backlog rather than bursting through it
+                self.accumulator %= FIXED_DT
+                break
+            self.step()
+            self.accumulator -= FIXED_DT
+            steps += 1
+            if self.game_over:
+                self.accumulator = 0
+                break
+        if self.recorder is not None:
+            self.recorder.log_frame(dt, steps)
+        self.alpha = self.accumulator / FIXED_DT
+        return self.alpha
+
+    def step(self, dt=FIXED_DT):
+        """Run one physics tick, FIXED_DT long unless given.
+
+        Collision is swept, so headless tools can take longer steps without
+        bricks passing through the ball. The game and replays always use
+        FIXED_DT.
+        """
+        if self.game_over:
+            return
+        self.tick += 1
+        if self.recorder is not None:
+            self.recorder.log_tick(self.player_x)
+        self.time += dt
+        self.score += dt
+
+        # Check for 20-point milestones
+        self.check_milestone()
+
+        # Move, cull and collision-test every brick in one batched pass
+        with self.profiler.scope('bricks'):
+            hit, culled = self.store.advance(dt, self.prev_player_x, self.player_x,
+                                             self.player_y, self.ball_radius)
+            self.prev_player_x = self.player_x
+            # Grab the hit brick first: culling swaps bricks between slots
+            hit_brick = self.store.bricks[hit] if hit >= 0 else None
+            for index in culled:
+                self.remove_brick(index)
+        if hit_brick is not None:
+            self.game_over = True
+            self.death_cause = hit_brick.kind
+            if self.recorder is not None:
+                self.recorder.finish(self)
+            self.listener.on_game_over()
+            return
+
+        with self.profiler.scope('spawn'):
+            # Check if it's time to add a new random brick
+            if self.time >= self.entry_times['next_time']:
+                self.add_random_brick()
+
+            # If all bricks have passed, generate a new set and increase level
+            if not self.store.count:
+                self.level += 1
+                self.listener.on_level_up(self.level, False)
+                self.generate_brick_set()
+
+
+if __name__ == '__main__':
+    # Quick headless throughput check: python -m bricks.engine [difficulty]
+    import sys
+    import time
+    engine = GameEngine(390, 844, difficulty=sys.argv[1] if len(sys.argv) > 1 else 'normal')
+    engine.reset()
+    frames = 200000
+    games = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        engine.step()
+        if engine.game_over:
+            games += 1
+            engine.reset()
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames, {games} games in {elapsed:.2f}s ({frames / elapsed:.0f} frames/s)")
@@ -0,0 +1,99 @@
+# coding: utf-8
+"""Crash-safe file writes.
+
+Every file the game keeps (high scores, telemetry stats, the leaderboard
+outbox, snapshots, replays) is written the same way: to a temp file next
+to it, which is fsynced and then renamed over the real one. A crash leaves
+either the old file or the new one, never half of each.
+
+BackgroundWriter is the write-behind thread the stores share, so the main
+thread only ever queues work.
+"""
+import contextlib
+import json
+import os
+import threading
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode='w'):
+    """Open a temp file for writing that replaces `path` once the block ends"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode) as f:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_json(path, data):
+    with atomic_open(path) as f:
+        json.dump(data, f)
+
+
+class BackgroundWriter:
+    """Calls write(items) on its own thread with everything put() since the
+    last call, oldest first.
+
+    The thread waits `coalesce_delay` seconds after the first item so that
+    a burst lands in one write. With `latest_only`, a put() replaces
+    whatever is still waiting, so only the newest item is written.
+    """
+
+    def __init__(self, write, name, coalesce_delay=0.0, latest_only=False):
+        self.write = write
+        self.name = name
+        self.coalesce_delay = coalesce_delay
+        self.latest_only = latest_only
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.pending = []
+        self.writing = False
+        self.closed = False
+        self.writes = 0
+        self.thread = threading.Thread(target=self._run, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, item):
+        """Queue `item`; never blocks on I/O"""
+        with self.lock:
+            if self.latest_only:
+                self.pending = [item]
+            else:
+                self.pending.append(item)
+            self.wakeup.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written"""
+        with self.lock:
+            return self.wakeup.wait_for(lambda: not self.pending and not self.writing, timeout)
+
+    def close(self, timeout=None):
+        """Write what's queued, without waiting out the coalescing delay, and stop"""
+        with self.lock:
+            self.closed = True
+            self.wakeup.notify_all()
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                self.wakeup.wait_for(lambda: self.pending or self.closed)
+                if not self.pending:
+                    return
+                if self.coalesce_delay and not self.closed:
+                    # Let rapid updates pile up into a single write
+                    self.wakeup.wait_for(lambda: self.closed, self.coalesce_delay)
+                items = self.pending
+                self.pending = []
+                self.writing = True
+            try:
+                self.write(items)
+            except Exception as e:
+                print(f"Error in {self.name}: {e}")
+            finally:
+                with self.lock:
+                    self.writing = False
+                    self.writes += 1
+                    self.wakeup.notify_all()
@@ -0,0 +1,216 @@
+# coding: utf-8
+"""Precomputed brick formation layouts.
+
+A formation is 3 to 5 bricks on a grid of slots a quarter brick apart. It
+is then shifted sideways as a whole. The screen width fixes the grid, so
+every possible formation is laid out, fixed up and checked once per width
+instead of at each spawn. Each layout carries the shift ranges that keep
+at least two ball-sized passages open. Where the grid can't be fixed up
+(narrow screens), packed layouts with two explicit passages stand in.
+Spawning a formation is then one table lookup and one random shift.
+
+Tables are cached per (width, required gap) in a small LRU, so every game
+and every engine at the same screen size (the tools run many) shares one.
+"""
+import functools
+import itertools
+
+MIN_BRICKS = 3
+MAX_BRICKS = 5
+
+
+def passages(xs, width, half, required_gap, shift=0.0):
+    """Number of gaps of at least `required_gap` in a sorted formation"""
+    count = 0
+    prev_right = 0  # Left screen edge
+    for x in xs:
+        if x + shift - half - prev_right >= required_gap:
+            count += 1
+        prev_right = x + shift + half
+    if width - prev_right >= required_gap:
+        count += 1
+    return count
+
+
+def ensure_safe_passage(xs, width, half, required_gap):
+    """Make sure a formation of brick centres leaves two ball-sized gaps.
+
+    Returns the centres sorted left-to-right, possibly with one removed.
+    """
+    xs = sorted(xs)
+
+    # Check existing gaps including screen edges
+    gaps = []
+    prev_right = 0  # Left screen edge
+    for x in xs:
+        current_left = x - half
+        if current_left - prev_right >= required_gap:
+            gaps.append((prev_right, current_left))
+        prev_right = x + half
+
+    # Check right screen edge
+    if width - prev_right >= required_gap:
+        gaps.append((prev_right, width))
+
+    # If enough gaps exist, do nothing
+    if len(gaps) >= 2:
+        return xs
+
+    # Create necessary gaps by repositioning bricks
+    target_gaps = 2
+    created_gaps = 0
+
+    # First ensure left screen edge gap
+    if not any(g[0] == 0 for g in gaps):
+        new_x = required_gap + half
+        if new_x < xs[0]:
+            xs[0] = new_x
+            created_gaps += 1
+
+    # Then ensure right screen edge gap
+    if not any(g[1] == width for g in gaps):
+        new_x = width - required_gap - half
+        if new_x > xs[-1]:
+            xs[-1] = new_x
+            created_gaps += 1
+
+    # Create middle gaps if still needed
+    if created_gaps < target_gaps and len(xs) >= 2:
+        # Find largest existing gap between bricks
+        max_gap_size = 0
+        max_gap_index = -1
+        for i in range(1, len(xs)):
+            gap = (xs[i] - half) - (xs[i-1] + half)
+            if gap > max_gap_size:
+                max_gap_size = gap
+                max_gap_index = i
+
+        # Enlarge the largest gap if possible
+        if max_gap_size > 0 and max_gap_index != -1:
+            needed_space = required_gap - max_gap_size
+            if needed_space > 0:
+                left_available = xs[max_gap_index-1] - half
+                right_available = width - (xs[max_gap_index] + half)
+                xs[max_gap_index-1] -= min(needed_space / 2, left_available)
+                xs[max_gap_index] += min(needed_space / 2, right_available)
+                created_gaps += 1
+
+    # Final check and fallback: drop the middle brick for an emergency gap
+    if created_gaps < target_gaps:
+        del xs[len(xs) // 2]
+    return xs
+
+
+def safe_shifts(xs, width, half, required_gap):
+    """Shift ranges [(lo, hi), ...] that keep `xs` on screen with two passages.
+
+    Gaps between bricks don't change with a shift, only the two edge gaps
+    do, so the safe set is at most two intervals.
+    """
+    lo = -(xs[0] - half)
+    hi = width - (xs[-1] + half)
+    if hi < lo:
+        return []
+    inner = passages(xs, width, half, required_gap, shift=0.0) - \
+        (xs[0] - half >= required_gap) - (width - (xs[-1] + half) >= required_gap)
+    # Shifts that open the left edge gap (s >= left_min) or the right one (s <= right_max)
+    left_min = lo + required_gap
+    right_max = hi - required_gap
+    if inner >= 2:
+        ranges = [(lo, hi)]
+    elif inner == 1:
+        if right_max >= left_min:  # Every shift opens at least one edge
+            ranges = [(lo, hi)]
+        else:
+            ranges = [(lo, right_max), (left_min, hi)]
+    else:
+        ranges = [(left_min, right_max)]
+    return [(a, b) for a, b in ranges if a <= b]
+
+
+def packed_layouts(count, width, brick_width, required_gap):
+    """Formations of `count` bricks with exactly two passages, for screens
+    too narrow for the grid: the free width goes into two of the count + 1
+    gaps, and the bricks in between sit at most a quarter brick apart.
+    """
+    free = width - count * brick_width
+    if count < 1 or free < 2 * required_gap:
+        return []
+    half = brick_width / 2
+    closed = count - 1  # Gaps that aren't passages
+    spacing = min(brick_width / 4, (free - 2 * required_gap) / closed) if closed else 0
+    passage = (free - closed * spacing) / 2
+    layouts = []
+    for first, second in itertools.combinations(range(count + 1), 2):
+        xs = []
+        x = 0
+        for i in range(count + 1):
+            x += passage if i in (first, second) else spacing
+            if i < count:
+                xs.append(x + half)
+                x += brick_width
+        xs = tuple(xs)
+        ranges = safe_shifts(xs, width, half, required_gap)
+        if ranges:
+            layouts.append((xs, ranges, sum(b - a for a, b in ranges)))
+    return layouts
+
+
+class FormationTable:
+    """Every safe formation for one screen width, grouped by brick count"""
+
+    def __init__(self, width, brick_width, required_gap):
+        self.width = width
+        half = brick_width / 2
+        min_spacing = brick_width / 4  # Quarter brick spacing
+
+        # Grid slot centres, as the old per-spawn generator laid them out
+        slots = []
+        x = half
+        while x <= width - half:
+            slots.append(x)
+            x += brick_width + min_spacing
+
+        # layouts[n]: (xs, [(lo, hi), ...], total shift length) for n bricks
+        self.layouts = {}
+        for n in range(MIN_BRICKS, MAX_BRICKS + 1):
+            layouts = []
+            fixup_failed = False
+            for combo in itertools.combinations(slots, min(n, len(slots))):
+                xs = ensure_safe_passage(combo, width, half, required_gap)
+                ranges = safe_shifts(xs, width, half, required_gap) if xs else []
+                if ranges:
+                    layouts.append((tuple(xs), ranges, sum(b - a for a, b in ranges)))
+                else:
+                    fixup_failed = True
+            if fixup_failed:
+                # Some grid layouts can't be fixed up on this width; use packed
+                # ones instead, with as many bricks as still fit
+                for count in range(min(n, len(slots)), 0, -1):
+                    packed = packed_layouts(count, width, brick_width, required_gap)
+                    if packed:
+                        layouts.extend(packed)
+                        break
+            self.layouts[n] = layouts
+
+    def sample(self, rng, count):
+        """Brick centres for a random `count`-brick formation, shifted at random"""
+        layouts = self.layouts.get(count)
+        if not layouts:
+            return []
+        xs, ranges, total = layouts[rng.randrange(len(layouts))]
+        offset = rng.uniform(0, total)
+        for lo, hi in ranges:
+            shift = lo + offset
+            if shift <= hi:
+                break
+            offset -= hi - lo
+        else:
+            shift = ranges[-1][1]
+        return [x + shift for x in xs]
+
+
+@functools.lru_cache(maxsize=4)
+def formation_table(width, brick_width, required_gap):
+    """Shared FormationTable; the LRU keeps the few screen sizes in use"""
+    return FormationTable(width, brick_width, required_gap)
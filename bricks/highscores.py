@@ -0,0 +1,86 @@
+# coding: utf-8
+"""In-memory high score table with write-behind persistence.
+
+The file is read once, when the store is created. After that, qualifying
+a score is a single comparison and adding one is a bisect insert, all in
+memory. Saves go to a fileio.BackgroundWriter, which waits briefly so
+that bursts of updates become one write. Each write goes to a temp file
+that is fsynced and then renamed over the real file, so a crash never
+leaves a half-written high_scores.json behind.
+"""
+import bisect
+import datetime
+import json
+import os
+import threading
+
+from .fileio import BackgroundWriter, write_json
+
+
+class HighScoreStore:
+    def __init__(self, path='high_scores.json', limit=5, coalesce_delay=0.25):
+        self.path = path
+        self.limit = limit
+        self.coalesce_delay = coalesce_delay
+        self.entries = []  # Best first
+        self.keys = []  # -score per entry, ascending, for bisect
+        self.lock = threading.Lock()
+        self.load()
+        self.writer = BackgroundWriter(self._write, 'high-score-writer', coalesce_delay,
+                                       latest_only=True)
+
+    def load(self):
+        entries = []
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    entries = json.load(f)
+        except Exception as e:
+            print(f"Error loading high scores: {e}")
+        entries.sort(key=lambda x: x.get('score', 0), reverse=True)
+        with self.lock:
+            self.entries = entries[:self.limit]
+            self.keys = [-entry.get('score', 0) for entry in self.entries]
+
+    def top(self):
+        """Copy of the current table, best first"""
+        with self.lock:
+            return list(self.entries)
+
+    def qualifies(self, score):
+        """True if `score` would make the table"""
+        with self.lock:
+            if len(self.keys) < self.limit:
+                return True
+            # Only has to beat the lowest entry, which is the last key
+            return -score < self.keys[-1]
+
+    def add(self, score, name):
+        """Insert a score and schedule a save; returns the new table"""
+        entry = {
+            'score': score,
+            'name': name if name else "Anonymous",
+            'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+        }
+        with self.lock:
+            # Ties go after existing entries with the same score
+            i = bisect.bisect_right(self.keys, -score)
+            self.keys.insert(i, -score)
+            self.entries.insert(i, entry)
+            del self.keys[self.limit:]
+            del self.entries[self.limit:]
+            self.writer.put(list(self.entries))
+            return list(self.entries)
+
+    def flush(self, timeout=None):
+        """Block until every scheduled save has hit the disk"""
+        return self.writer.flush(timeout)
+
+    def close(self, timeout=None):
+        self.writer.close(timeout)
+
+    def _write(self, tables):
+        try:
+            write_json(self.path, tables[-1])
+        except Exception as e:
+            print(f"Error saving high scores: {e}")
@@ -0,0 +1,258 @@
+# coding: utf-8
+"""Dirty-tracked HUD labels built from cached glyph textures.
+
+A LabelNode re-rasterizes its whole texture on every .text assignment.
+NumberLabel instead draws a fixed prefix/suffix plus one sprite per digit,
+each using a texture rendered once and cached in a GlyphCache. Setting a
+value that's already displayed costs nothing, and a score going from
+119 to 120 only swaps the textures of the two digits that changed.
+
+Unlike the rest of the package this is renderer code and needs scene and
+ui.
+"""
+import math
+
+import ui
+from scene import LabelNode, Node, SpriteNode, Texture
+
+
+def text_texture(text, font, color='white'):
+    """`text` drawn once into a ui.Image and wrapped in a Texture"""
+    w, h = ui.measure_string(text, font=font)
+    w, h = math.ceil(w), math.ceil(h)
+    with ui.ImageContext(w, h) as ctx:
+        ui.draw_string(text, rect=(0, 0, w, h), font=font, color=color)
+        image = ctx.get_image()
+    return Texture(image)
+
+
+class GlyphCache:
+    """Texture for each (text, font) pair, rendered on first use"""
+
+    def __init__(self):
+        self.textures = {}
+        self.fonts = []  # Fonts digits are drawn in, for prewarm_later()
+
+    def get(self, text, font):
+        key = (text, font)
+        texture = self.textures.get(key)
+        if texture is None:
+            texture = text_texture(text, font)
+            self.textures[key] = texture
+        return texture
+
+    def prewarm_later(self, call_soon, glyphs='0123456789'):
+        """Queue every digit not yet rendered, one call_soon() per glyph, so
+        they spread over the task budget of the next few frames"""
+        for font in self.fonts:
+            for glyph in glyphs:
+                if (glyph, font) not in self.textures:
+                    call_soon(self.get, glyph, font)
+
+
+class NumberLabel:
+    """`prefix` + integer + `suffix`, centred on `position`"""
+
+    def __init__(self, glyphs, parent, prefix, position, font, suffix=''):
+        self.glyphs = glyphs
+        self.font = font
+        self.root = Node(parent=parent, position=position)
+        self.prefix = SpriteNode(glyphs.get(prefix, font), parent=self.root) if prefix else None
+        self.suffix = SpriteNode(glyphs.get(suffix, font), parent=self.root) if suffix else None
+        self.digits = []  # One sprite per digit, reused across values
+        self.text = None  # Digits currently displayed
+        self.redraws = 0  # Digit texture swaps, for instrumentation
+        if font not in glyphs.fonts:
+            glyphs.fonts.append(font)
+
+    def set(self, value):
+        """Display `value`; returns False if it was already showing"""
+        text = str(value)
+        if text == self.text:
+            return False
+        old = self.text or ''
+        while len(self.digits) < len(text):
+            self.digits.append(SpriteNode(parent=self.root))
+        for i, glyph in enumerate(text):
+            if i >= len(old) or old[i] != glyph:
+                node = self.digits[i]
+                node.texture = self.glyphs.get(glyph, self.font)
+                node.size = node.texture.size
+                node.alpha = 1
+                self.redraws += 1
+        for node in self.digits[len(text):]:
+            node.alpha = 0
+        self.text = text
+        if len(text) != len(old):
+            self.layout()
+        return True
+
+    def layout(self):
+        """Lay the parts out left to right (digit glyphs are equal width)"""
+        parts = []
+        if self.prefix is not None:
+            parts.append(self.prefix)
+        parts.extend(self.digits[:len(self.text)])
+        if self.suffix is not None:
+            parts.append(self.suffix)
+        x = -sum(node.size.width for node in parts) / 2
+        for node in parts:
+            node.position = (x + node.size.width / 2, 0)
+            x += node.size.width
+
+
+class Hud:
+    """Score and level readouts and the pause button, plus a factory for
+    other number labels"""
+
+    def __init__(self, parent, size, font=('Helvetica', 18)):
+        self.glyphs = GlyphCache()
+        self.root = Node(parent=parent)
+        self.score = NumberLabel(self.glyphs, self.root, 'Score: ', (100, size.height - 30), font)
+        self.level = NumberLabel(self.glyphs, self.root, 'Level: ', (size.width - 100, size.height - 30), font)
+        self.pause_button = LabelNode('❚❚', position=(size.width / 2, size.height - 30),
+                                      font=('Helvetica', 20), parent=self.root)
+        self.score.set(0)
+        self.level.set(1)
+
+    def pause_hit(self, location, slop=30):
+        """True if a touch at `location` is on the pause button"""
+        x, y = self.pause_button.position
+        return abs(location.x - x) < slop and abs(location.y - y) < slop
+
+    def set_score(self, score):
+        return self.score.set(int(score))
+
+    def set_level(self, level):
+        return self.level.set(level)
+
+    def number_label(self, parent, prefix, position, font, suffix=''):
+        return NumberLabel(self.glyphs, parent, prefix, position, font, suffix)
+
+
+class GameOverOverlay:
+    """Game over screen and leaderboard, built once and reused.
+
+    show()/hide() attach and detach a single root node, and values are
+    updated in place, so nothing is created or scanned per game.
+    """
+
+    def __init__(self, hud, layer, size, max_scores=5):
+        self.layer = layer
+        cx = size.width / 2
+        cy = size.height / 2
+        self.root = Node()
+        SpriteNode(color='#00000099', size=size, position=(cx, cy), parent=self.root)
+        LabelNode('Game Over!', position=(cx, cy + 50), font=('Helvetica', 30), parent=self.root)
+        self.score = hud.number_label(self.root, 'Final Score: ', (cx, cy), ('Helvetica', 20))
+        self.level = hud.number_label(self.root, 'Level Reached: ', (cx, cy - 30), ('Helvetica', 20))
+        self.countdown = hud.number_label(self.root, 'Continuing in ', (cx, cy - 60),
+                                          ('Helvetica', 16), suffix=' seconds...')
+
+        # Leaderboard, attached under the countdown once scores are known
+        self.board = Node()
+        self.board_top = cy - 80
+        self.board_title = LabelNode('Top Scores:', position=(cx, self.board_top),
+                                     font=('Helvetica', 18), parent=self.board)
+        self.entries = [LabelNode('', position=(cx, self.board_top - 30 - 25 * i),
+                                  font=('Helvetica', 14), parent=self.board)
+                        for i in range(max_scores)]
+        self.restart = LabelNode('Tap to Restart', font=('Helvetica', 18), parent=self.board)
+        self.restart.position = (cx, self.board_top - 30)
+
+    @property
+    def visible(self):
+        return self.root.parent is not None
+
+    def show(self, score, level, countdown):
+        self.score.set(int(score))
+        self.level.set(level)
+        self.countdown.set(countdown)
+        self.board.remove_from_parent()
+        if self.root.parent is None:
+            self.layer.add_child(self.root)
+
+    def show_scores(self, high_scores, world=None):
+        """Show the local table; `world`, the global board, adds its best score"""
+        title = 'Top Scores:'
+        if world:
+            title = f"Top Scores (world best {world[0]['score']} - {world[0]['name']}):"
+        if self.board_title.text != title:
+            self.board_title.text = title
+        shown = high_scores[:len(self.entries)]
+        for i, label in enumerate(self.entries):
+            if i < len(shown):
+                entry = shown[i]
+                emoji = '⭐️' if i == 0 else f'{i+1}.'
+                label.text = f"{emoji} {entry['score']} - {entry['name']} ({entry['date']})"
+                label.alpha = 1
+            else:
+                label.alpha = 0
+        self.restart.position = (self.restart.position.x, self.board_top - 30 - 25 * len(shown))
+        if self.board.parent is None:
+            self.root.add_child(self.board)
+
+    def hide(self):
+        self.root.remove_from_parent()
+
+
+class PauseOverlay:
+    """Dimmed 'Paused' screen, built once and re-parented to show"""
+
+    def __init__(self, layer, size):
+        self.layer = layer
+        cx = size.width / 2
+        cy = size.height / 2
+        self.root = Node()
+        SpriteNode(color='#00000099', size=size, position=(cx, cy), parent=self.root)
+        LabelNode('Paused', position=(cx, cy + 20), font=('Helvetica', 30), parent=self.root)
+        LabelNode('Tap to Resume', position=(cx, cy - 20), font=('Helvetica', 18), parent=self.root)
+
+    def show(self):
+        if self.root.parent is None:
+            self.layer.add_child(self.root)
+
+    def hide(self):
+        self.root.remove_from_parent()
+
+
+class ProfilerOverlay:
+    """Frame-time bar graph plus per-scope and counter readouts.
+
+    Redraws every `refresh_every` frames; the graph shows the most recent
+    frames from the profiler's ring buffer against a 60 fps budget line.
+    """
+
+    def __init__(self, profiler, parent, size, bars=60, refresh_every=10, px_per_ms=4):
+        self.profiler = profiler
+        self.refresh_every = refresh_every
+        self.px_per_ms = px_per_ms
+        self.root = Node(parent=parent, position=(10, size.height - 140), z_position=10)
+        self.bars = []
+        for i in range(bars):
+            bar = SpriteNode(color='#00ff00', size=(3, 1), parent=self.root)
+            bar.anchor_point = (0.5, 0)
+            bar.position = (i * 4, 0)
+            self.bars.append(bar)
+        budget = SpriteNode(color='#ff000080', size=(bars * 4, 1), parent=self.root)
+        budget.anchor_point = (0, 0.5)
+        budget.position = (0, 1000 / 60 * px_per_ms)
+        self.text = LabelNode('', font=('Menlo', 10), parent=self.root)
+        self.text.anchor_point = (0, 1)
+        self.text.position = (0, -4)
+        self.frames_seen = 0
+
+    def update(self):
+        self.frames_seen += 1
+        if self.frames_seen % self.refresh_every:
+            return
+        frames = self.profiler.recent_frames(len(self.bars))
+        offset = len(self.bars) - len(frames)
+        for i, bar in enumerate(self.bars):
+            ms = frames[i - offset] if i >= offset else 0.0
+            bar.size = (3, max(1, ms * self.px_per_ms))
+            bar.color = '#00ff00' if ms < 1000 / 60 else '#ff3030'
+        summary = self.profiler.summary()
+        lines = [f"{name} {ms:.2f}ms" for name, ms in sorted(summary.items())]
+        lines.extend(f"{name} {value}" for name, value in sorted(self.profiler.counters.items()))
+        self.text.text = '\n'.join(lines)
@@ -0,0 +1,524 @@
+# coding: utf-8
+"""Global leaderboard sync.
+
+LeaderboardClient sends finished high scores to a leaderboard server and
+keeps a copy of the global top-N. The render thread only calls submit()
+and refresh(), which queue work and return at once. Everything else
+happens on one sync thread:
+
+- New scores go into an outbox in leaderboard.json, written atomically,
+  before any upload is tried, so scores survive crashes and offline play
+  and are sent on a later launch.
+- Uploads are batched (up to `batch_size` scores per POST) and sent over
+  one keep-alive HTTP connection that is reused for every request.
+- A burst of scores waits `coalesce_delay` seconds in the outbox so it can
+  share one upload.
+- Failed requests, including a 200 that isn't the expected JSON (a
+  captive portal or proxy page), are retried with exponential backoff and
+  jitter. Every score carries an id, so a batch the server saw but never
+  acknowledged is not counted twice.
+- The top-N is fetched with If-None-Match. An unchanged board comes back
+  as an empty 304, and the board and its ETag are cached in
+  leaderboard.json between launches.
+
+Protocol (JSON over HTTP):
+
+    POST /scores      {"scores": [{"id", "score", "name", "date"}, ...]}
+                      -> {"accepted": [id, ...]}
+    GET  /scores/top?n=N   -> {"scores": [...]} with an ETag, or 304
+
+StandInServer speaks the same protocol from memory, for tests and for
+playing against a laptop on the same network:
+
+    python -m bricks.leaderboard serve --port 8765 [--fail-rate 0.2]
+    python -m bricks.leaderboard check    # end-to-end run against a local server
+    python -m bricks.leaderboard status [leaderboard.json]
+"""
+import collections
+import datetime
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+from .fileio import write_json
+
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+class SyncError(Exception):
+    """A request that should be retried later"""
+
+
+def _parse(data, key, valid):
+    """The list under `key` in a JSON response body, each item passing `valid`.
+
+    Anything else, e.g. a captive portal's HTML page, is a SyncError.
+    """
+    try:
+        items = json.loads(data)[key]
+    except (ValueError, KeyError, TypeError) as e:
+        raise SyncError(f"unexpected response ({type(e).__name__}: {e})")
+    if not isinstance(items, list) or not all(valid(item) for item in items):
+        raise SyncError(f"unexpected response ({key!r} is malformed)")
+    return items
+
+
+class LeaderboardClient:
+    def __init__(self, url, path='leaderboard.json', top_n=10, batch_size=20, coalesce_delay=1.0,
+                 timeout=5.0, backoff=1.0, max_backoff=300.0, on_board=None):
+        parts = urllib.parse.urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.path = path
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.coalesce_delay = coalesce_delay
+        self.timeout = timeout
+        self.backoff = backoff  # First retry delay, doubled per failure
+        self.max_backoff = max_backoff
+        self.on_board = on_board  # Called on the sync thread with each new board
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.incoming = []  # Submitted, not yet in the outbox
+        self.outbox = []  # Saved, not yet accepted by the server
+        self.board = None
+        self.etag = None
+        self.want_board = True
+        self.busy = False
+        self.closed = False
+        self.failures = 0  # Consecutive failed requests
+        self.retry_at = 0.0
+        self.hold_until = 0.0  # Saved scores wait until then for more to join the batch
+        self.conn = None
+        self.stats = collections.Counter()
+        self.thread = threading.Thread(target=self._sync, name='leaderboard-sync')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, score, name, date=None):
+        """Queue a score for upload; never blocks on I/O"""
+        entry = {
+            'id': os.urandom(16).hex(),
+            'score': int(score),
+            'name': name if name else "Anonymous",
+            'date': date or datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+        }
+        with self.lock:
+            self.incoming.append(entry)
+            self.wakeup.notify_all()
+
+    def refresh(self):
+        """Ask for the global board again (free if it hasn't changed)"""
+        with self.lock:
+            self.want_board = True
+            self.wakeup.notify_all()
+
+    def top(self):
+        """Last global board seen, best first, or None"""
+        with self.lock:
+            return None if self.board is None else list(self.board)
+
+    def pending(self):
+        with self.lock:
+            return len(self.incoming) + len(self.outbox)
+
+    def flush(self, timeout=None):
+        """Block until every score is uploaded and the board is current"""
+        with self.lock:
+            return self.wakeup.wait_for(lambda: not (self.incoming or self.outbox or
+                                                     self.want_board or self.busy), timeout)
+
+    def close(self, timeout=None):
+        """Stop syncing; queued scores are saved to the outbox for next time"""
+        with self.lock:
+            self.closed = True
+            self.wakeup.notify_all()
+        self.thread.join(timeout)
+
+    def _sync(self):
+        # The outbox file and the connection are only touched from this thread.
+        # http.client is imported here, off the game's startup path.
+        import http.client
+        self.http = http.client
+        self._load()
+        while True:
+            with self.lock:
+                while not self.closed and not self.incoming:
+                    # New scores are saved right away, even while backing off
+                    if self.outbox or self.want_board:
+                        wait = max(self.retry_at, self.hold_until) - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self.wakeup.wait(wait)
+                    else:
+                        self.wakeup.wait()
+                closing = self.closed
+                self.busy = True
+            try:
+                # New scores hit the outbox file first; only the upload waits
+                # for the rest of a burst
+                if self._take_incoming() and not closing:
+                    now = time.monotonic()
+                    if self.hold_until <= now:
+                        self.hold_until = now + self.coalesce_delay
+                if closing:
+                    break
+                if time.monotonic() >= max(self.retry_at, self.hold_until):
+                    self._step()
+            except Exception as e:
+                print(f"Leaderboard sync error: {e}")
+                self._retry_later()
+            finally:
+                with self.lock:
+                    self.busy = False
+                    self.wakeup.notify_all()
+        if self.conn is not None:
+            self.conn.close()
+
+    def _take_incoming(self):
+        with self.lock:
+            new = self.incoming
+            self.incoming = []
+            self.outbox.extend(new)
+        if new:
+            self._save()
+        return len(new)
+
+    def _step(self):
+        """One upload or board fetch; failures schedule a retry"""
+        try:
+            if self.outbox:
+                self._upload(self.outbox[:self.batch_size])
+            elif self.want_board:
+                self._fetch_board()
+        except (SyncError, OSError) as e:
+            self._retry_later()
+            if self.failures == 1:
+                print(f"Leaderboard offline, will retry: {e}")
+        else:
+            self.failures = 0
+            self.retry_at = 0.0
+
+    def _retry_later(self):
+        self.failures += 1
+        delay = min(self.max_backoff, self.backoff * 2 ** min(self.failures - 1, 20))
+        self.retry_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+        self.stats['retries'] += 1
+
+    def _upload(self, batch):
+        status, _, data = self._request('POST', '/scores', {'scores': batch})
+        if status in RETRY_STATUSES:
+            raise SyncError(f"upload got HTTP {status}")
+        if status == 200:
+            accepted = set(_parse(data, 'accepted', lambda item: isinstance(item, str)))
+            self.stats['uploaded'] += len(accepted)
+        else:
+            # The server will never take these; don't retry them forever
+            print(f"Leaderboard rejected {len(batch)} score(s): HTTP {status}")
+            accepted = {entry['id'] for entry in batch}
+            self.stats['rejected'] += len(accepted)
+        with self.lock:
+            self.outbox = [entry for entry in self.outbox if entry['id'] not in accepted]
+            self.want_board = True
+        self._save()
+
+    def _fetch_board(self):
+        headers = {'If-None-Match': self.etag} if self.etag else {}
+        status, etag, data = self._request('GET', f"/scores/top?n={self.top_n}", headers=headers)
+        if status in RETRY_STATUSES:
+            raise SyncError(f"board fetch got HTTP {status}")
+        if status == 304:
+            self.stats['not_modified'] += 1
+        elif status == 200:
+            board = _parse(data, 'scores',
+                           lambda item: isinstance(item, dict) and 'score' in item and 'name' in item)
+            with self.lock:
+                self.board = board
+                self.etag = etag
+            self.stats['boards'] += 1
+            self._save()
+            if self.on_board is not None:
+                self.on_board(list(board))
+        else:
+            print(f"Leaderboard board fetch failed: HTTP {status}")
+        with self.lock:
+            self.want_board = False
+
+    def _request(self, method, path, body=None, headers=None):
+        """(status, ETag, body bytes), reusing the keep-alive connection"""
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body, separators=(',', ':')).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in (0, 1):
+            reused = self.conn is not None
+            if not reused:
+                http = self.http
+                cls = http.HTTPSConnection if self.https else http.HTTPConnection
+                self.conn = cls(self.host, self.port, timeout=self.timeout)
+                self.stats['connections'] += 1
+            try:
+                self.conn.request(method, self.prefix + path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()  # Read it all so the connection can be reused
+            except (OSError, self.http.HTTPException) as e:
+                self.conn.close()
+                self.conn = None
+                if not reused or attempt:
+                    raise SyncError(e)
+                continue  # The server dropped the idle connection; redial once
+            self.stats['requests'] += 1
+            if response.will_close:
+                self.conn.close()
+                self.conn = None
+            return response.status, response.getheader('ETag'), data
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Error loading leaderboard state: {e}")
+            return
+        with self.lock:
+            self.outbox = state.get('outbox', []) + self.outbox
+            self.board = state.get('board')
+            self.etag = state.get('etag')
+
+    def _save(self):
+        with self.lock:
+            state = {'outbox': list(self.outbox), 'board': self.board, 'etag': self.etag}
+        try:
+            write_json(self.path, state)
+        except Exception as e:
+            print(f"Error saving leaderboard state: {e}")
+
+
+class StandInServer:
+    """In-memory leaderboard server on a background thread.
+
+    Speaks the client protocol with HTTP/1.1 keep-alive and ETags. A
+    `fail_rate` fraction of requests get a 503 to exercise retries; with
+    `captive` set, every request gets a 200 HTML page instead, like a
+    captive portal.
+    """
+
+    def __init__(self, port=0, host='127.0.0.1', fail_rate=0.0, seed=None):
+        import http.server
+        self.scores = {}  # id -> entry
+        self.version = 0  # Bumped when the board may have changed; the ETag
+        self.fail_rate = fail_rate
+        self.captive = False
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = collections.Counter()
+        self.connections = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive
+
+            def setup(self):
+                super().setup()
+                with server.lock:
+                    server.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, body, headers=()):
+                data = json.dumps(body).encode() if body is not None else b''
+                self.send_response(status)
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(data)))
+                if data:
+                    self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_portal(self):
+                data = b'<html><body>Sign in to continue</body></html>'
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                server.requests['POST'] += 1
+                if server.captive:
+                    return self.send_portal()
+                if urllib.parse.urlsplit(self.path).path != '/scores':
+                    return self.send_json(404, {'error': 'not found'})
+                if server.failing():
+                    return self.send_json(503, {'error': 'try later'})
+                try:
+                    entries = json.loads(data)['scores']
+                    accepted = server.add(entries)
+                except (ValueError, KeyError, TypeError):
+                    return self.send_json(400, {'error': 'bad scores'})
+                self.send_json(200, {'accepted': accepted})
+
+            def do_GET(self):
+                server.requests['GET'] += 1
+                if server.captive:
+                    return self.send_portal()
+                parts = urllib.parse.urlsplit(self.path)
+                if parts.path != '/scores/top':
+                    return self.send_json(404, {'error': 'not found'})
+                if server.failing():
+                    return self.send_json(503, {'error': 'try later'})
+                n = int(urllib.parse.parse_qs(parts.query).get('n', ['10'])[0])
+                etag, board = server.top(n)
+                if self.headers.get('If-None-Match') == etag:
+                    server.requests['304'] += 1
+                    return self.send_json(304, None, [('ETag', etag)])
+                self.send_json(200, {'scores': board}, [('ETag', etag)])
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def failing(self):
+        with self.lock:
+            return self.rng.random() < self.fail_rate
+
+    def add(self, entries):
+        with self.lock:
+            accepted = []
+            for entry in entries:
+                if not isinstance(entry['score'], int) or not isinstance(entry['name'], str):
+                    raise ValueError('bad entry')
+                if entry['id'] not in self.scores:
+                    self.scores[entry['id']] = {key: entry[key] for key in ('id', 'score', 'name', 'date')}
+                    self.version += 1
+                accepted.append(entry['id'])
+            return accepted
+
+    def top(self, n):
+        with self.lock:
+            board = sorted(self.scores.values(), key=lambda e: -e['score'])[:n]
+            return f'"v{self.version}"', board
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='leaderboard-server')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def check(scores, fail_rate, seed):
+    """End-to-end run against a StandInServer; returns 0 if everything synced"""
+    import tempfile
+    server = StandInServer(fail_rate=fail_rate, seed=seed).start()
+    rng = random.Random(seed)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'leaderboard.json')
+        client = LeaderboardClient(server.url, path, coalesce_delay=0.05, backoff=0.01, max_backoff=0.2)
+        start = time.perf_counter()
+        for i in range(scores):
+            client.submit(rng.randint(1, 500), f"bot{i}")
+            if i % 10 == 9:
+                time.sleep(0.05)  # Bursts, like a few games in a row
+        synced = client.flush(timeout=30)
+        elapsed = time.perf_counter() - start
+        board = client.top()
+        _, expected = server.top(client.top_n)
+        print(f"{scores} scores synced in {elapsed:.2f}s with {fail_rate:.0%} injected failures: "
+              f"{dict(client.stats)}")
+        print(f"server: {len(server.scores)} scores, {server.connections} connection(s), "
+              f"requests {dict(server.requests)}")
+        ok &= synced and len(server.scores) == scores and board == expected
+        client.refresh()
+        client.flush(timeout=30)
+        ok &= client.stats['not_modified'] >= 1  # Unchanged board: 304, no payload
+        client.close()
+
+        # Scores queued while the server is down wait in the outbox, across launches
+        server.fail_rate = 1.0
+        client = LeaderboardClient(server.url, path, coalesce_delay=0, backoff=0.01, max_backoff=0.05)
+        for i in range(5):
+            client.submit(1000 + i, f"offline{i}")
+        time.sleep(0.3)
+        client.close()
+        server.fail_rate = 0.0
+        client = LeaderboardClient(server.url, path, coalesce_delay=0, backoff=0.01)
+        ok &= client.flush(timeout=30) and len(server.scores) == scores + 5
+        print(f"after an offline session and a relaunch: {len(server.scores)} scores on the server, "
+              f"best {client.top()[0]['score']}")
+        client.close()
+
+        # A captive portal answers 200 with a web page: back off, keep the scores
+        server.captive = True
+        before = sum(server.requests.values())
+        client = LeaderboardClient(server.url, path, coalesce_delay=0, backoff=0.1, max_backoff=1.0)
+        client.submit(2000, 'portal')
+        time.sleep(1.0)
+        client.close()
+        requests = sum(server.requests.values()) - before
+        print(f"behind a captive portal: {requests} requests in 1s, "
+              f"{client.pending()} score(s) kept for later")
+        ok &= requests <= 8 and client.pending() == 1
+        server.captive = False
+    server.stop()
+    print('OK' if ok else 'FAILED')
+    return 0 if ok else 1
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Falling Bricks leaderboard sync')
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help='run a stand-in leaderboard server')
+    serve.add_argument('--host', default='0.0.0.0')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--fail-rate', type=float, default=0.0)
+    run = sub.add_parser('check', help='sync against a local stand-in server')
+    run.add_argument('--scores', type=int, default=50)
+    run.add_argument('--fail-rate', type=float, default=0.3)
+    run.add_argument('--seed', type=int, default=1)
+    status = sub.add_parser('status', help='show the local outbox and cached board')
+    status.add_argument('path', nargs='?', default='leaderboard.json')
+    args = parser.parse_args(argv)
+
+    if args.command == 'check':
+        return check(args.scores, args.fail_rate, args.seed)
+    if args.command == 'status':
+        with open(args.path) as f:
+            state = json.load(f)
+        print(f"{len(state['outbox'])} score(s) waiting to upload, board ETag {state['etag']}")
+        for i, entry in enumerate(state['board'] or []):
+            print(f"{i + 1:>3}. {entry['score']} - {entry['name']} ({entry['date']})")
+        return 0
+    server = StandInServer(args.port, args.host, fail_rate=args.fail_rate)
+    print(f"Leaderboard server on {server.url}; set LEADERBOARD_URL to this machine's address")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
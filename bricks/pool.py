@@ -0,0 +1,79 @@
+# coding: utf-8
+"""Object pool for renderer nodes.
+
+Bricks come and go several times a second at high levels; creating and
+destroying a SpriteNode for each one shows up as GC hitches. NodePool keeps
+released nodes around (hidden) and hands them back out. It knows nothing
+about scene itself: the caller supplies the create/hide/destroy callables.
+"""
+
+
+class NodePool:
+    def __init__(self, create, hide, destroy=None, prealloc=0, trim_interval=5.0):
+        self.create = create
+        self.hide = hide
+        self.destroy = destroy
+        self.reserve = prealloc  # Never trim below this many free nodes
+        self.trim_interval = trim_interval
+        self.free = []
+        self.in_use = 0
+        self.hits = 0
+        self.misses = 0
+        self.high_water = 0  # Most nodes ever in use at once
+        self.window_peak = 0  # Most nodes in use since the last trim
+        self.last_trim = None
+        for _ in range(prealloc):
+            node = self.create()
+            self.hide(node)
+            self.free.append(node)
+
+    def acquire(self):
+        """Return a free node, creating one if the pool is empty"""
+        if self.free:
+            node = self.free.pop()
+            self.hits += 1
+        else:
+            node = self.create()
+            self.misses += 1
+        self.in_use += 1
+        if self.in_use > self.window_peak:
+            self.window_peak = self.in_use
+            if self.in_use > self.high_water:
+                self.high_water = self.in_use
+        return node
+
+    def release(self, node):
+        """Hide `node` and keep it for reuse"""
+        self.hide(node)
+        self.free.append(node)
+        self.in_use -= 1
+
+    def trim(self, now):
+        """Drop free nodes nobody needed during the last `trim_interval` seconds.
+
+        Call once per frame; it only does work once per interval.
+        """
+        if self.last_trim is None:
+            self.last_trim = now
+            return 0
+        if now - self.last_trim < self.trim_interval:
+            return 0
+        keep = max(self.reserve, self.window_peak - self.in_use)
+        dropped = 0
+        while len(self.free) > keep:
+            node = self.free.pop()
+            if self.destroy is not None:
+                self.destroy(node)
+            dropped += 1
+        self.window_peak = self.in_use
+        self.last_trim = now
+        return dropped
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'high_water': self.high_water,
+            'in_use': self.in_use,
+            'free': len(self.free),
+        }
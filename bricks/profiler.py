@@ -0,0 +1,157 @@
+# coding: utf-8
+"""Opt-in frame profiler.
+
+Named scopes time each phase of a frame:
+
+    with profiler.scope('physics'):
+        engine.advance(dt)
+
+Per-frame totals for each scope go into a fixed-size ring buffer, which
+feeds the on-screen overlay (hud.ProfilerOverlay) and summary(). Every
+scope, including those outside a frame such as setup, is also kept as a
+Chrome trace event. export_chrome_trace() writes those events to a file
+that chrome://tracing or Perfetto can open.
+
+A disabled profiler hands out a shared no-op scope, so instrumented code
+costs one method call per scope.
+"""
+import collections
+import functools
+import json
+import threading
+import time
+from array import array
+
+clock = time.perf_counter
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SCOPE = _NullScope()
+
+
+class _Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, clock())
+        return False
+
+
+class FrameProfiler:
+    def __init__(self, enabled=False, capacity=240, max_events=20000):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.frame = 0  # Frames recorded so far
+        self.frame_ms = array('d', [0.0] * capacity)
+        self.phases = {}  # scope name -> array of per-frame ms, same ring as frame_ms
+        self.current = {}  # scope name -> ms accumulated in the current frame
+        self.counters = {}
+        self.events = collections.deque(maxlen=max_events)
+        self.scopes = {}
+        self.frame_start = None
+        self.epoch = clock()
+        self.tid = threading.get_ident()
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = _Scope(self, name)
+        return scope
+
+    def record(self, name, start, end):
+        ms = (end - start) * 1000
+        if self.frame_start is not None:
+            self.current[name] = self.current.get(name, 0.0) + ms
+        self.events.append((name, start, end))
+
+    def count(self, name, value):
+        """Set a counter shown on the overlay and exported with the trace"""
+        if self.enabled:
+            self.counters[name] = value
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = clock()
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        end = clock()
+        slot = self.frame % self.capacity
+        self.frame_ms[slot] = (end - self.frame_start) * 1000
+        for name, ms in self.current.items():
+            ring = self.phases.get(name)
+            if ring is None:
+                ring = self.phases[name] = array('d', [0.0] * self.capacity)
+            ring[slot] = ms
+        for name, ring in self.phases.items():
+            if name not in self.current:
+                ring[slot] = 0.0
+        self.events.append(('frame', self.frame_start, end))
+        if self.counters:
+            self.events.append((dict(self.counters), end, None))
+        self.current.clear()
+        self.frame_start = None
+        self.frame += 1
+
+    def recent_frames(self, count=None):
+        """Frame times in ms, oldest first, from the ring buffer"""
+        filled = min(self.frame, self.capacity)
+        count = filled if count is None else min(count, filled)
+        return [self.frame_ms[(self.frame - count + i) % self.capacity] for i in range(count)]
+
+    def summary(self):
+        """Mean ms per frame for the whole frame and each scope"""
+        filled = min(self.frame, self.capacity)
+        if not filled:
+            return {}
+        result = {'frame': sum(self.frame_ms[:filled]) / filled}
+        for name, ring in self.phases.items():
+            result[name] = sum(ring[:filled]) / filled
+        return result
+
+    def export_chrome_trace(self, path):
+        """Write recorded events in Chrome trace-event JSON format"""
+        trace = []
+        for name, start, end in list(self.events):
+            ts = (start - self.epoch) * 1e6
+            if end is None:
+                trace.append({'name': 'counters', 'ph': 'C', 'ts': ts, 'pid': 1,
+                              'tid': self.tid, 'args': name})
+            else:
+                trace.append({'name': name, 'cat': 'game', 'ph': 'X', 'ts': ts,
+                              'dur': (end - start) * 1e6, 'pid': 1, 'tid': self.tid})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        return len(trace)
+
+
+def profiled(name):
+    """Method decorator: time the call as scope `name` of self.profiler"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.scope(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
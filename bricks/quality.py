@@ -0,0 +1,109 @@
+# coding: utf-8
+"""Adaptive quality governor.
+
+QualityGovernor watches a rolling mean of frame time. When frames
+consistently take longer than the budget, it steps quality down one tier.
+
+Frame time can't show headroom: with vsync, a frame that makes the budget
+lasts one refresh however little of it was used. So the scene also passes
+the CPU time its update() took, and the governor steps back up only after
+a long stretch where that stays well under budget. If a tier it stepped
+up to gets dropped again soon after, the stretch needed to try that tier
+again doubles each time. Different thresholds for down and up, a minimum
+time between changes, and the long up-dwell keep it from flapping between
+tiers.
+
+Tiers are cumulative; each one keeps the savings of those before it:
+
+    0 full            everything on
+    1 flat_background full-screen background sprite replaced by a flat color
+    2 batched_bricks  brick nodes synced every other frame, no interpolation
+    3 slow_hud        score label redrawn a few times a second
+    4 spawn_cap       random bricks spawn at most every SPAWN_FLOOR seconds
+
+The governor only decides; the scene applies a tier. Every change is
+printed and kept in `changes`, and the scene reports the current tier as a
+profiler counter.
+"""
+from array import array
+
+TIERS = ('full', 'flat_background', 'batched_bricks', 'slow_hud', 'spawn_cap')
+FLAT_BACKGROUND, BATCHED_BRICKS, SLOW_HUD, SPAWN_CAP = 1, 2, 3, 4
+
+SPAWN_FLOOR = 0.25  # Seconds between random bricks at the spawn_cap tier
+HUD_EVERY = 6  # Frames between score redraws at the slow_hud tier
+
+
+class QualityGovernor:
+    def __init__(self, budget=1 / 60, window=30, down=1.25, up=0.6, up_frames=300,
+                 max_up_frames=300 * 32, relapse=600, cooldown=90, max_tier=len(TIERS) - 1):
+        self.budget = budget  # Target frame time in seconds
+        self.window = window
+        self.down = down  # Step down when the mean frame time exceeds budget * down
+        self.up = up  # Headroom means the mean update() time is under budget * up ...
+        self.up_frames = [up_frames] * len(TIERS)  # ... for this many frames in a row, per tier
+        self.max_up_frames = max_up_frames
+        self.relapse = relapse  # A drop this many frames after stepping up reverses it
+        self.cooldown = cooldown  # Frames after a change before the next one
+        self.max_tier = max_tier
+        self.samples = array('d', [budget] * window)
+        self.work = array('d', [budget] * window)
+        self.total = budget * window
+        self.work_total = budget * window
+        self.frame = 0
+        self.last_change = 0
+        self.last_up = None  # (frame, tier left) of the last step up
+        self.headroom = 0  # Consecutive frames with headroom
+        self.tier = 0
+        self.changes = []  # (frame, old tier, new tier, mean ms)
+
+    @property
+    def mean(self):
+        return self.total / self.window
+
+    @property
+    def work_mean(self):
+        return self.work_total / self.window
+
+    def sample(self, dt, work=None):
+        """Add one frame's time and the CPU time its update() took (`dt` if
+        not given); returns the new tier if it changed, else None"""
+        # Clamp stalls (first frames, app switches) so one can't force a drop
+        dt = min(max(dt, 0.0), self.budget * 4)
+        work = dt if work is None else min(max(work, 0.0), self.budget * 4)
+        slot = self.frame % self.window
+        self.total += dt - self.samples[slot]
+        self.samples[slot] = dt
+        self.work_total += work - self.work[slot]
+        self.work[slot] = work
+        self.frame += 1
+        if self.frame < self.window:
+            return None
+
+        if self.work_mean < self.budget * self.up:
+            self.headroom += 1
+        else:
+            self.headroom = 0
+        if self.frame - self.last_change < self.cooldown:
+            return None
+        if self.mean > self.budget * self.down and self.tier < self.max_tier:
+            return self.set_tier(self.tier + 1)
+        if self.headroom >= self.up_frames[self.tier] and self.tier > 0:
+            return self.set_tier(self.tier - 1)
+        return None
+
+    def set_tier(self, tier):
+        old = self.tier
+        if tier > old and self.last_up is not None:
+            up_frame, left = self.last_up
+            if left == tier and self.frame - up_frame <= self.relapse:
+                # The step up didn't hold: wait longer before trying it again
+                self.up_frames[tier] = min(self.up_frames[tier] * 2, self.max_up_frames)
+        self.last_up = (self.frame, old) if tier < old else None
+        self.tier = tier
+        self.last_change = self.frame
+        self.headroom = 0
+        self.changes.append((self.frame, old, tier, self.mean * 1000))
+        print(f"Quality {'down' if tier > old else 'up'}: {TIERS[old]} -> {TIERS[tier]} "
+              f"(mean frame {self.mean * 1000:.1f} ms)")
+        return tier
@@ -0,0 +1,272 @@
+# coding: utf-8
+"""Seeded session recording and bit-exact playback.
+
+A session is one game, from GameEngine.reset() to game over. Because the
+engine's randomness comes from a per-game seed and player x is quantized,
+a replay only needs:
+
+- the seed, screen size and difficulty
+- the player x at every tick
+- per-frame timing (dt and ticks run), used to pace rendered playback
+- the ticks at which the quality governor changed the spawn floor
+
+The file is little-endian binary: a fixed header, then zigzag varint
+deltas of the quantized player x (almost all zero), then varint
+(dt in microseconds, ticks) pairs per frame, then a varint count of
+(tick delta, floor in microseconds) pairs. A one-minute session is a few
+kilobytes.
+
+    python -m bricks.replay verify session.fbr
+    python -m bricks.replay bench session.fbr --repeat 20
+"""
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+from .engine import FIXED_DT, GameEngine, PLAYER_QUANTUM
+from .fileio import atomic_open
+
+MAGIC = b'FBRP'
+# 2: formations from formations.FormationTable, 3: spawn floors, 4: swept collision,
+# 5: swept player x
+VERSION = 5
+# magic, version, width, height, seed, ticks, frames, checksum, completed
+HEADER = struct.Struct('<4sBddQIIIB')
+
+
+def state_checksum(engine):
+    """CRC of everything that must match for two runs to be identical"""
+    store = engine.store
+    n = store.count
+    data = array('d', [engine.score, engine.time, engine.milestone_boost, engine.player_x,
+                       float(engine.tick), float(engine.level)])
+    data.extend(float(v) for v in store.x[:n])
+    data.extend(float(v) for v in store.y[:n])
+    data.extend(float(v) for v in store.speed[:n])
+    return zlib.crc32(data.tobytes())
+
+
+def _put_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+class Replay:
+    def __init__(self, width, height, difficulty, seed):
+        self.width = width
+        self.height = height
+        self.difficulty = difficulty
+        self.seed = seed
+        self.xs = array('i')  # Player x per tick, in PLAYER_QUANTUM units
+        self.frame_us = array('I')  # Frame dt in microseconds
+        self.frame_ticks = array('B')  # Ticks run in each frame
+        self.spawn_floors = []  # (tick, seconds): floor in effect from that tick on
+        self.checksum = 0
+        self.completed = False  # True once the session reached game over
+
+    @property
+    def ticks(self):
+        return len(self.xs)
+
+    def encode(self):
+        name = self.difficulty.encode('utf-8')
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.width, self.height, self.seed,
+                                    len(self.xs), len(self.frame_us), self.checksum,
+                                    1 if self.completed else 0))
+        out.append(len(name))
+        out += name
+        prev = 0
+        for x in self.xs:
+            delta = x - prev
+            _put_varint(out, delta << 1 if delta >= 0 else (-delta << 1) - 1)
+            prev = x
+        for us, ticks in zip(self.frame_us, self.frame_ticks):
+            _put_varint(out, us)
+            _put_varint(out, ticks)
+        _put_varint(out, len(self.spawn_floors))
+        prev = 0
+        for tick, seconds in self.spawn_floors:
+            _put_varint(out, tick - prev)
+            _put_varint(out, int(round(seconds * 1e6)))
+            prev = tick
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data):
+        magic, version, width, height, seed, ticks, frames, checksum, completed = \
+            HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a Falling Bricks replay (or an unsupported version)')
+        pos = HEADER.size
+        name_len = data[pos]
+        difficulty = bytes(data[pos + 1:pos + 1 + name_len]).decode('utf-8')
+        pos += 1 + name_len
+        replay = cls(width, height, difficulty, seed)
+        replay.checksum = checksum
+        replay.completed = bool(completed)
+        x = 0
+        for _ in range(ticks):
+            value, pos = _get_varint(data, pos)
+            x += (value >> 1) ^ -(value & 1)
+            replay.xs.append(x)
+        for _ in range(frames):
+            us, pos = _get_varint(data, pos)
+            steps, pos = _get_varint(data, pos)
+            replay.frame_us.append(us)
+            replay.frame_ticks.append(steps)
+        count, pos = _get_varint(data, pos)
+        tick = 0
+        for _ in range(count):
+            delta, pos = _get_varint(data, pos)
+            us, pos = _get_varint(data, pos)
+            tick += delta
+            replay.spawn_floors.append((tick, us / 1e6))
+        return replay
+
+    def save(self, path):
+        with atomic_open(path, 'wb') as f:
+            f.write(self.encode())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.decode(f.read())
+
+
+class ReplayRecorder:
+    """Attach as engine.recorder; keeps the most recent session in `replay`"""
+
+    def __init__(self):
+        self.replay = None
+        self.finished = None  # Last session that reached game over
+
+    def begin(self, engine):
+        self.replay = Replay(engine.width, engine.height, engine.difficulty, engine.seed)
+        if engine.spawn_floor:
+            self.log_spawn_floor(0, engine.spawn_floor)
+
+    def log_tick(self, player_x):
+        self.replay.xs.append(int(round(player_x / PLAYER_QUANTUM)))
+
+    def log_spawn_floor(self, tick, seconds):
+        if self.replay is not None:
+            self.replay.spawn_floors.append((tick, seconds))
+
+    def log_frame(self, dt, ticks):
+        self.replay.frame_us.append(min(int(dt * 1e6), 0xffffffff))
+        self.replay.frame_ticks.append(min(ticks, 255))
+
+    def finish(self, engine):
+        self.replay.checksum = state_checksum(engine)
+        self.replay.completed = True
+        self.finished = self.replay
+
+
+class ReplayPlayer:
+    """Feeds a replay's inputs into an engine, tick by tick or frame by frame"""
+
+    def __init__(self, replay, engine):
+        self.replay = replay
+        self.engine = engine
+        self.next_tick = 0
+        self.next_frame = 0
+        self.next_floor = 0
+        self.accumulator = 0.0
+        engine.spawn_floor = 0
+        engine.reset(seed=replay.seed)
+
+    @property
+    def done(self):
+        return self.engine.game_over or self.next_tick >= self.replay.ticks
+
+    def step(self):
+        """Run one tick with its recorded input"""
+        floors = self.replay.spawn_floors
+        while self.next_floor < len(floors) and floors[self.next_floor][0] <= self.engine.tick:
+            self.engine.spawn_floor = floors[self.next_floor][1]
+            self.next_floor += 1
+        self.engine.move_player(self.replay.xs[self.next_tick] * PLAYER_QUANTUM)
+        self.engine.step()
+        self.next_tick += 1
+
+    def run(self):
+        """Re-simulate the rest of the session as fast as possible"""
+        while not self.done:
+            self.step()
+        return self.engine
+
+    def frame(self):
+        """Play back one recorded frame; returns the interpolation factor"""
+        replay = self.replay
+        if self.next_frame >= len(replay.frame_us):
+            self.run()
+            return 0.0
+        steps = replay.frame_ticks[self.next_frame]
+        self.accumulator += replay.frame_us[self.next_frame] / 1e6
+        self.next_frame += 1
+        for _ in range(steps):
+            if self.done:
+                break
+            self.step()
+        self.accumulator = max(0.0, self.accumulator - steps * FIXED_DT)
+        if self.accumulator >= FIXED_DT:
+            # The recording hit the catch-up cap here and dropped time
+            self.accumulator %= FIXED_DT
+        return self.accumulator / FIXED_DT
+
+    def verify(self):
+        """True if the re-simulation ended exactly where the recording did"""
+        engine = self.run()
+        if not self.replay.completed:
+            return self.next_tick == self.replay.ticks
+        return (engine.game_over and engine.tick == self.replay.ticks
+                and state_checksum(engine) == self.replay.checksum)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Verify or benchmark a Falling Bricks replay')
+    parser.add_argument('command', choices=('verify', 'bench'))
+    parser.add_argument('path')
+    parser.add_argument('--repeat', type=int, default=10, help='re-simulations for bench')
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.path)
+    print(f"{args.path}: seed {replay.seed}, {replay.ticks} ticks, "
+          f"{len(replay.frame_us)} frames, {replay.difficulty}")
+    if args.command == 'verify':
+        player = ReplayPlayer(replay, GameEngine(replay.width, replay.height,
+                                                 difficulty=replay.difficulty))
+        ok = player.verify()
+        print('OK: bit-exact' if ok else 'MISMATCH: re-simulation diverged')
+        return 0 if ok else 1
+
+    best = None
+    for _ in range(args.repeat):
+        engine = GameEngine(replay.width, replay.height, difficulty=replay.difficulty)
+        start = time.perf_counter()
+        ReplayPlayer(replay, engine).run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"best of {args.repeat}: {best * 1000:.2f} ms "
+          f"({replay.ticks / best:.0f} ticks/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+# coding: utf-8
+"""Minimal stand-in for Pythonista's scene module.
+
+Just enough of Node, SpriteNode, LabelNode, Texture and Scene for
+Falling-bricks.py to set up and run headless, e.g. under the benchmark
+harness. Nothing is drawn; nodes only keep their attributes. Call
+install() before importing the game.
+"""
+import sys
+
+__all__ = ['PORTRAIT', 'LANDSCAPE', 'DEFAULT_ORIENTATION', 'Point', 'Size', 'Texture',
+           'render_text', 'get_screen_scale', 'Node', 'SpriteNode', 'LabelNode', 'ShapeNode', 'Scene', 'run']
+
+PORTRAIT = 'portrait'
+LANDSCAPE = 'landscape'
+DEFAULT_ORIENTATION = 'default'
+
+
+class Point:
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x=0, y=0):
+        self.x = x
+        self.y = y
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __repr__(self):
+        return f'Point({self.x}, {self.y})'
+
+
+class Size:
+    __slots__ = ('w', 'h')
+
+    def __init__(self, w=0, h=0):
+        self.w = w
+        self.h = h
+
+    @property
+    def width(self):
+        return self.w
+
+    @property
+    def height(self):
+        return self.h
+
+    def __iter__(self):
+        yield self.w
+        yield self.h
+
+    def __repr__(self):
+        return f'Size({self.w}, {self.h})'
+
+
+def _point(value):
+    return value if isinstance(value, Point) else Point(*value)
+
+
+def _size(value):
+    return value if isinstance(value, Size) else Size(*value)
+
+
+class Texture:
+    def __init__(self, image=None, size=(64, 64)):
+        self.image = image
+        self.size = _size(getattr(image, 'size', size))  # A ui.Image knows its size
+
+
+def render_text(text, font_name='Helvetica', font_size=16.0):
+    """Like scene.render_text: an image name for the legacy drawing API, and its size"""
+    return f'text:{text}', Size(len(text) * font_size * 0.55, font_size * 1.2)
+
+
+def get_screen_scale():
+    return 1.0
+
+
+class Node:
+    def __init__(self, position=(0, 0), z_position=0.0, scale=1.0, alpha=1.0, parent=None):
+        self.children = []
+        self.parent = None
+        self.position = position
+        self.z_position = z_position
+        self.scale = scale
+        self.alpha = alpha
+        self.paused = False
+        if parent is not None:
+            parent.add_child(self)
+
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, value):
+        self._position = _point(value)
+
+    def add_child(self, node):
+        if node.parent is not None:
+            node.remove_from_parent()
+        node.parent = self
+        self.children.append(node)
+
+    def remove_from_parent(self):
+        if self.parent is not None:
+            self.parent.children.remove(self)
+            self.parent = None
+
+    def remove_all_children(self):
+        for child in list(self.children):
+            child.remove_from_parent()
+
+
+class SpriteNode(Node):
+    def __init__(self, texture=None, position=(0, 0), z_position=0.0, scale=1.0, alpha=1.0,
+                 color='white', size=None, parent=None, **kwargs):
+        if isinstance(texture, str):
+            texture = Texture(texture)
+        self.texture = texture
+        self.color = color
+        if size is None:
+            size = texture.size if texture is not None else (100, 100)
+        self.size = size
+        self.anchor_point = (0.5, 0.5)
+        super().__init__(position, z_position, scale, alpha, parent)
+
+    @property
+    def size(self):
+        return self._size
+
+    @size.setter
+    def size(self, value):
+        self._size = _size(value)
+
+
+class LabelNode(SpriteNode):
+    def __init__(self, text='', font=('Helvetica', 20), position=(0, 0), parent=None, **kwargs):
+        self.font = font
+        super().__init__(None, position=position, parent=parent, **kwargs)
+        self.text = text
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value
+        self.size = render_text(value, *self.font)[1]
+        self.texture = Texture(None, self.size)
+
+
+class ShapeNode(SpriteNode):
+    pass
+
+
+class Scene(Node):
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.size = Size(390, 844)
+        self.bounds = None
+        self.t = 0.0
+        self.dt = 0.0
+        self.background_color = 'black'
+
+    def setup(self):
+        pass
+
+    def update(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+
+def run(scene, orientation=DEFAULT_ORIENTATION, **kwargs):
+    raise RuntimeError('scene_stub cannot present scenes; drive setup()/update() directly')
+
+
+def install():
+    """Register this module as `scene` so `from scene import *` picks it up,
+    and ui_stub as `ui`"""
+    from . import ui_stub
+    sys.modules['scene'] = sys.modules[__name__]
+    ui_stub.install()
+
+
+def load_game(path=None):
+    """Install the stub and import Falling-bricks.py; returns the module"""
+    import importlib.util
+    import os
+    install()
+    if path is None:
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'Falling-bricks.py')
+    spec = importlib.util.spec_from_file_location('falling_bricks', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_game(module, size=(390, 844)):
+    """Create and set up a FallingBricksGame at `size`, ready for step()"""
+    game = module.FallingBricksGame()
+    game.size = _size(size)
+    game.setup()
+    return game
+
+
+def step(game, dt=1 / 60):
+    """Advance the scene clock by `dt` and run one update()"""
+    game.dt = dt
+    game.t += dt
+    game.update()
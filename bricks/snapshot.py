@@ -0,0 +1,246 @@
+# coding: utf-8
+"""Game-state snapshots for crash recovery and instant resume.
+
+capture() packs everything the simulation needs to carry on exactly where
+it was into a compact little-endian binary blob:
+
+- the engine's clock, score, level, milestone boost and brick entry
+  timing
+- the player's x, and where it was at the last tick
+- the Mersenne Twister state of the game's rng
+- every live brick, as whole float64 columns plus one byte each for its
+  color and kind
+
+The blob ends with a CRC of everything before it. restore() loads it into
+an engine in one pass: the bricks go into the store in one go, then each
+one is announced to the listener, which builds its node. A restored engine
+then ticks bit-identically to the one that was captured.
+
+SnapshotWriter writes checkpoints through a fileio.BackgroundWriter, like
+the high score store: the latest snapshot wins, and it goes to a temp file
+that is fsynced and renamed over the real one.
+
+    python -m bricks.snapshot bench    # size and speed at 10/100/1000 bricks
+"""
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+from .engine import FIXED_DT, GameEngine
+from .fileio import BackgroundWriter, atomic_open
+from .store import FIELDS
+
+MAGIC = b'FBSN'
+VERSION = 2  # 2: player x at the last tick
+# magic, version, width, height, seed, tick, time, score, level, last milestone,
+# milestone points, milestone boost, milestone factor, player x, player x at the
+# last tick, accumulator, next brick time, min delay, max delay, speed factor,
+# brick count
+HEADER = struct.Struct('<4sBddQIddHIIdddddddddI')
+# Mersenne Twister: version, 624 words + position, then gauss_next (flag, value)
+RNG = struct.Struct('<B625IBd')
+KINDS = ('random', 'set')
+
+
+def _column(data, pos, count):
+    values = array('d')
+    values.frombytes(data[pos:pos + 8 * count])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def capture(engine):
+    """The engine's complete simulation state as bytes"""
+    store = engine.store
+    entry = engine.entry_times
+    out = bytearray(HEADER.pack(
+        MAGIC, VERSION, engine.width, engine.height, engine.seed, engine.tick, engine.time,
+        engine.score, engine.level, engine.last_milestone, engine.milestone_points,
+        engine.milestone_boost, engine.milestone_factor, engine.player_x, engine.prev_player_x,
+        engine.accumulator,
+        entry['next_time'], entry['min_delay'], entry['max_delay'], entry['speed_factor'],
+        store.count))
+    name = engine.difficulty.encode('utf-8')
+    out.append(len(name))
+    out += name
+    version, words, gauss = engine.rng.getstate()
+    out += RNG.pack(version, *words, gauss is not None, gauss or 0.0)
+    for field in FIELDS:
+        column = store.column_bytes(field)
+        if sys.byteorder == 'big':
+            swapped = array('d')
+            swapped.frombytes(column)
+            swapped.byteswap()
+            column = swapped.tobytes()
+        out += column
+    out += bytes(brick.color_index for brick in store.bricks)
+    out += bytes(KINDS.index(brick.kind) for brick in store.bricks)
+    out += struct.pack('<I', zlib.crc32(out))
+    return bytes(out)
+
+
+def restore(engine, data):
+    """Load a capture() into `engine`, replacing its game.
+
+    Existing bricks are removed through the listener and the new ones
+    announced to it, so a renderer is rebuilt along the way. Raises
+    ValueError for damaged data or a different screen size.
+    """
+    if len(data) < HEADER.size + 4 or struct.unpack_from('<I', data, len(data) - 4)[0] != \
+            zlib.crc32(data[:-4]):
+        raise ValueError('Snapshot is damaged')
+    (magic, version, width, height, seed, tick, time_, score, level, last_milestone,
+     milestone_points, milestone_boost, milestone_factor, player_x, prev_player_x, accumulator,
+     next_time, min_delay, max_delay, speed_factor, count) = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a Falling Bricks snapshot (or an unsupported version)')
+    if (width, height) != (engine.width, engine.height):
+        raise ValueError(f"Snapshot is for a {width:g}x{height:g} screen")
+    pos = HEADER.size
+    name_len = data[pos]
+    difficulty = bytes(data[pos + 1:pos + 1 + name_len]).decode('utf-8')
+    pos += 1 + name_len
+    rng = RNG.unpack_from(data, pos)
+    pos += RNG.size
+    columns = {}
+    for field in FIELDS:
+        columns[field] = _column(data, pos, count)
+        pos += 8 * count
+    colors = data[pos:pos + count]
+    kinds = [KINDS[k] for k in data[pos + count:pos + 2 * count]]
+
+    engine.clear_bricks()
+    engine.seed = seed
+    engine.rng.setstate((rng[0], tuple(rng[1:626]), rng[627] if rng[626] else None))
+    engine.tick = tick
+    engine.time = time_
+    engine.score = score
+    engine.level = level
+    engine.last_milestone = last_milestone
+    engine.milestone_points = milestone_points
+    engine.milestone_boost = milestone_boost
+    engine.milestone_factor = milestone_factor
+    engine.accumulator = accumulator
+    engine.alpha = accumulator / FIXED_DT
+    engine.game_over = False
+    engine.death_cause = None
+    engine.difficulty = difficulty
+    engine.entry_times = {'min_delay': min_delay, 'max_delay': max_delay,
+                          'speed_factor': speed_factor, 'next_time': next_time}
+    engine.player_x = player_x
+    engine.prev_player_x = prev_player_x
+    for brick in engine.store.load(columns, colors, kinds):
+        engine.listener.on_brick_added(brick)
+    return engine
+
+
+class SnapshotWriter:
+    """Writes the latest checkpoint, or deletes it, on a background thread"""
+
+    DELETE = b''
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = BackgroundWriter(self._write, 'snapshot-writer', latest_only=True)
+
+    def load(self):
+        """The saved snapshot's bytes, or None (blocking; small file)"""
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error loading snapshot: {e}")
+            return None
+
+    def save(self, data):
+        """Schedule `data` to replace the checkpoint; never blocks on I/O"""
+        self.writer.put(data)
+
+    def discard(self):
+        """Schedule the checkpoint's removal, e.g. once the game is over"""
+        self.save(self.DELETE)
+
+    def flush(self, timeout=None):
+        return self.writer.flush(timeout)
+
+    def close(self, timeout=None):
+        self.writer.close(timeout)
+
+    def _write(self, pending):
+        data = pending[-1]
+        try:
+            if not data:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            with atomic_open(self.path, 'wb') as f:
+                f.write(data)
+        except Exception as e:
+            print(f"Error saving snapshot: {e}")
+
+
+def filled_engine(bricks, seed=1):
+    """An engine mid-game with `bricks` live bricks spread over the screen"""
+    engine = GameEngine(390, 844)
+    engine.reset(seed=seed)
+    rng = random.Random(seed)
+    for _ in range(100):
+        engine.step()
+    engine.clear_bricks()
+    for _ in range(bricks):
+        brick = engine.add_brick(rng.uniform(30, 360), rng.uniform(60, 240))
+        engine.store.y[brick.index] = engine.store.prev_y[brick.index] = rng.uniform(300, 844)
+    return engine
+
+
+def round_trip_exact(engine, ticks=300):
+    """True if a restored copy of `engine` runs `ticks` ticks identically"""
+    from .replay import state_checksum
+    copy = restore(GameEngine(engine.width, engine.height), capture(engine))
+    rng = random.Random(2)
+    for _ in range(ticks):
+        x = rng.uniform(0, engine.width)
+        for e in (engine, copy):
+            e.move_player(x)
+            e.step()
+    return (engine.tick == copy.tick and engine.game_over == copy.game_over
+            and state_checksum(engine) == state_checksum(copy))
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Falling Bricks snapshot benchmark')
+    parser.add_argument('command', choices=('bench',))
+    parser.add_argument('--bricks', default='10,100,1000')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    print(f"{'bricks':>6} {'bytes':>8} {'capture':>10} {'restore':>10}  round trip")
+    for count in (int(n) for n in args.bricks.split(',')):
+        engine = filled_engine(count)
+        data = capture(engine)
+        target = GameEngine(engine.width, engine.height)
+        best_capture = best_restore = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            capture(engine)
+            middle = time.perf_counter()
+            restore(target, data)
+            end = time.perf_counter()
+            best_capture = middle - start if best_capture is None else min(best_capture, middle - start)
+            best_restore = end - middle if best_restore is None else min(best_restore, end - middle)
+        exact = round_trip_exact(engine)
+        print(f"{count:>6} {len(data):>8} {best_capture * 1e6:8.1f}us {best_restore * 1e6:8.1f}us  "
+              f"{'exact' if exact else 'DIVERGED'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
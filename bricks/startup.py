@@ -0,0 +1,101 @@
+# coding: utf-8
+"""Staged startup helpers.
+
+setup() only builds what the first frame needs: a placeholder background
+color, the player, the HUD and the first bricks. The rest runs on
+TaskRunner workers and swaps in when ready:
+
+- scaled_background() decodes the full-size background image once,
+  shrinks it to the screen's pixel size and caches the result on disk.
+  Later launches load the small cached file.
+- optional_module() imports sound/console off the startup path.
+
+StartupTimer measures each stage from launch, including time to first
+frame, and prints one line once every stage has finished.
+"""
+import importlib
+import os
+import threading
+import time
+
+CACHE_DIR = '.cache'
+
+_modules = {}
+_modules_lock = threading.Lock()
+
+
+def optional_module(name, missing_message=None):
+    """Import `name` once, from any thread; None if it isn't available"""
+    with _modules_lock:
+        if name not in _modules:
+            try:
+                _modules[name] = importlib.import_module(name)
+            except ImportError:
+                _modules[name] = None
+                if missing_message:
+                    print(missing_message)
+        return _modules[name]
+
+
+def scaled_background(path, size, scale=1.0, cache_dir=CACHE_DIR):
+    """Path of `path` shrunk to `size` points at `scale` pixels per point.
+
+    Never scales up: each side is capped at the source's, and if neither
+    side shrinks the source itself is returned. The resized copy is named
+    after the source's mtime and the target size, so it is made once per
+    screen size and redone if the source changes. Without PIL, or if
+    resizing fails, returns `path` itself. Blocking: run it on a worker.
+    """
+    Image = optional_module('PIL.Image')  # Imported here to keep it off the startup path
+    if Image is None:
+        return path
+    with Image.open(path) as image:
+        source_width, source_height = image.size  # Header only; nothing decoded
+    width = min(source_width, max(1, int(round(size[0] * scale))))
+    height = min(source_height, max(1, int(round(size[1] * scale))))
+    if (width, height) == (source_width, source_height):
+        return path
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cached = os.path.join(cache_dir, f"{stem}_{width}x{height}_{int(os.path.getmtime(path))}.jpg")
+    if os.path.exists(cached):
+        return cached
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with Image.open(path) as image:
+            # Let JPEG decode at a reduced size when it can, then resample
+            image.draft('RGB', (width, height))
+            image = image.convert('RGB').resize((width, height), Image.BILINEAR)
+        tmp = cached + '.tmp'
+        image.save(tmp, 'JPEG', quality=90)
+        os.replace(tmp, cached)
+        return cached
+    except Exception as e:
+        print(f"Could not cache scaled background: {e}")
+        return path
+
+
+class StartupTimer:
+    """Milliseconds from `launched` (a perf_counter time) to each stage"""
+
+    def __init__(self, launched, stages, profiler=None):
+        self.launched = launched
+        self.stages = tuple(stages)
+        self.profiler = profiler
+        self.marks = {}
+        self.done = False
+
+    def mark(self, stage):
+        """Record `stage` as finished now; only the first call counts"""
+        if stage in self.marks:
+            return
+        now = time.perf_counter()
+        self.marks[stage] = (now - self.launched) * 1000
+        if self.profiler is not None and self.profiler.enabled:
+            self.profiler.events.append((f"startup:{stage}", self.launched, now))
+        if not self.done and all(s in self.marks for s in self.stages):
+            self.done = True
+            self.report()
+
+    def report(self):
+        stages = ', '.join(f"{s} {self.marks[s]:.0f} ms" for s in self.stages)
+        print(f"Startup: {stages}")
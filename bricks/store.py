@@ -0,0 +1,299 @@
+# coding: utf-8
+"""Structure-of-arrays brick storage.
+
+Brick i lives at index i of the x, y, prev_y, half_w, half_h and speed
+arrays, so movement, off-screen culling and circle-vs-rectangle collision
+run as one batched pass per tick instead of a Python loop over nodes.
+
+Collision is swept: a brick hits the ball if it overlapped it anywhere
+along its path during the step, not just at the end. The ball is swept
+too, across every x it held during the step. So fast bricks can't tunnel
+through the ball at high levels, with dropped frames or with large
+timesteps, and neither can a fast swipe carry the ball through a brick.
+The arrays start out as array.array and the batched pass is a single
+tight loop. NumPy's per-call overhead loses to that loop for a handful of
+bricks, so the first time a store holds VECTOR_MIN bricks it imports NumPy,
+if it's installed, and moves its columns into NumPy arrays for a
+vectorized pass. Once it's down to half that, they move back. A normal
+game never gets there, so it never pays for the import.
+
+Removal swaps the last brick into the freed slot, so indices are not
+stable; Brick handles track their current index and are what the renderer
+holds on to.
+"""
+from array import array
+
+np = None
+numpy_available = None  # Not known until a store first needs NumPy
+
+FIELDS = ('x', 'y', 'prev_y', 'half_w', 'half_h', 'speed')
+VECTOR_MIN = 48  # Brick count where NumPy starts beating the scalar loop
+
+
+def load_numpy():
+    """NumPy, imported on first call; None if it isn't installed"""
+    global np, numpy_available
+    if numpy_available is None:
+        try:
+            import numpy
+            np = numpy
+            numpy_available = True
+        except ImportError:
+            numpy_available = False
+    return np
+
+
+def swept_hit(x, y0, y1, half_w, half_h, cx0, cx1, cy, radius):
+    """True if a box centred on x, moving from y0 to y1, touches the circle
+    while it moves from cx0 to cx1.
+
+    The circle is taken to be at every x between cx0 and cx1 for the whole
+    move, so dx is the gap between the box and the nearest of them. At
+    horizontal distance dx from the box, the circle reaches sqrt(r² - dx²)
+    above and below its centre. So the box overlaps it while its centre is
+    within half_h plus that of cy. The move hits if the span it covers meets
+    that band.
+    """
+    left, right = (cx1, cx0) if cx1 < cx0 else (cx0, cx1)
+    dx = max(left - x, x - right, 0.0) - half_w
+    if dx < 0:
+        dx = 0.0
+    elif dx >= radius:
+        return False
+    reach = half_h + (radius * radius - dx * dx) ** 0.5
+    low, high = (y1, y0) if y1 < y0 else (y0, y1)
+    return low < cy + reach and high > cy - reach
+
+
+class Brick:
+    """Handle for one brick in a BrickStore. `node` is owned by the renderer.
+
+    `kind` says where it came from: 'set' for formation bricks, 'random'
+    for single spawns.
+    """
+    __slots__ = ('store', 'index', 'color_index', 'kind', 'node')
+
+    def __init__(self, store, index, color_index, kind='random'):
+        self.store = store
+        self.index = index
+        self.color_index = color_index
+        self.kind = kind
+        self.node = None
+
+    @property
+    def x(self):
+        return float(self.store.x[self.index])
+
+    @property
+    def y(self):
+        return float(self.store.y[self.index])
+
+    @property
+    def prev_y(self):
+        return float(self.store.prev_y[self.index])
+
+    @property
+    def width(self):
+        return float(self.store.half_w[self.index]) * 2
+
+    @property
+    def height(self):
+        return float(self.store.half_h[self.index]) * 2
+
+    @property
+    def speed(self):
+        return float(self.store.speed[self.index])
+
+
+class BrickStore:
+    def __init__(self, capacity=64, use_numpy=None):
+        self.use_numpy = use_numpy  # False keeps the scalar path at any brick count
+        self.vectorized = False  # Columns are NumPy arrays
+        self.capacity = capacity
+        self.bricks = []  # Brick handles, parallel to the arrays
+        self.count = 0
+        for name in FIELDS:
+            setattr(self, name, array('d'))
+
+    def __len__(self):
+        return self.count
+
+    def _vectorize(self):
+        """Move the columns into NumPy arrays, once VECTOR_MIN bricks are live"""
+        if load_numpy() is None:
+            self.use_numpy = False
+            return
+        while self.capacity <= self.count:
+            self.capacity *= 2
+        for name in FIELDS:
+            column = np.zeros(self.capacity)
+            column[:self.count] = getattr(self, name)
+            setattr(self, name, column)
+        self.vectorized = True
+
+    def _devectorize(self):
+        """Move the columns back into array.array, once under VECTOR_MIN // 2
+        bricks; the gap keeps a count hovering at VECTOR_MIN from flipping"""
+        for name in FIELDS:
+            setattr(self, name, array('d', getattr(self, name)[:self.count].tobytes()))
+        self.vectorized = False
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(self.capacity)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, x, y, speed, color_index, width, height, kind='random'):
+        """Append a brick and return its handle"""
+        i = self.count
+        values = (x, y, y, width / 2, height / 2, speed)
+        if self.vectorized:
+            if i == self.capacity:
+                self._grow()
+            for name, value in zip(FIELDS, values):
+                getattr(self, name)[i] = value
+        else:
+            for name, value in zip(FIELDS, values):
+                getattr(self, name).append(value)
+        brick = Brick(self, i, color_index, kind)
+        self.bricks.append(brick)
+        self.count += 1
+        if self.count >= VECTOR_MIN and not self.vectorized and self.use_numpy is not False:
+            self._vectorize()
+        return brick
+
+    def remove(self, index):
+        """Remove the brick at `index`, moving the last brick into its slot"""
+        last = self.count - 1
+        if index != last:
+            for name in FIELDS:
+                column = getattr(self, name)
+                column[index] = column[last]
+            moved = self.bricks[last]
+            moved.index = index
+            self.bricks[index] = moved
+        if not self.vectorized:
+            for name in FIELDS:
+                getattr(self, name).pop()
+        self.bricks.pop()
+        self.count = last
+        if self.vectorized and last < VECTOR_MIN // 2:
+            self._devectorize()
+
+    def clear(self):
+        self.bricks = []
+        self.count = 0
+        if self.vectorized:
+            self._devectorize()
+        else:
+            for name in FIELDS:
+                del getattr(self, name)[:]
+
+    def column_bytes(self, name):
+        """Native float64 bytes of field `name` for the live bricks"""
+        return getattr(self, name)[:self.count].tobytes()
+
+    def load(self, columns, color_indices, kinds):
+        """Replace every brick at once; returns the new handles.
+
+        `columns` maps each name in FIELDS to an array('d') of values.
+        """
+        n = len(color_indices)
+        self.clear()
+        for name in FIELDS:
+            getattr(self, name).extend(columns[name])
+        self.bricks = [Brick(self, i, color, kind)
+                       for i, (color, kind) in enumerate(zip(color_indices, kinds))]
+        self.count = n
+        if n >= VECTOR_MIN and not self.vectorized and self.use_numpy is not False:
+            self._vectorize()
+        return self.bricks
+
+    def advance(self, dt, cx0, cx1, cy, radius):
+        """Move every brick down by speed * dt and sweep it against the ball.
+
+        Returns (hit, culled): the index of a brick that touched the circle,
+        moving from (cx0, cy) to (cx1, cy), during the move, or -1, and the
+        indices of bricks that fell off the bottom, highest first so they
+        can be removed in order.
+        """
+        n = self.count
+        if n == 0:
+            return -1, []
+        r2 = radius * radius
+        left, right = (cx1, cx0) if cx1 < cx0 else (cx0, cx1)
+        if self.vectorized:
+            x = self.x[:n]
+            y = self.y[:n]
+            half_w = self.half_w[:n]
+            half_h = self.half_h[:n]
+            prev_y = self.prev_y[:n]
+            prev_y[:] = y
+            y -= self.speed[:n] * dt
+            gone = y < -2 * half_h
+            # Swept test, as in swept_hit(); bricks move down, so y <= prev_y
+            dx = np.maximum(np.maximum(left - x, x - right) - half_w, 0.0)
+            near = dx < radius
+            reach = half_h + np.sqrt(np.maximum(r2 - dx * dx, 0.0))
+            hits = np.flatnonzero(near & (y < cy + reach) & (prev_y > cy - reach))
+            culled = np.flatnonzero(gone)[::-1].tolist()
+            return (int(hits[0]) if len(hits) else -1), culled
+
+        x = self.x
+        y = self.y
+        prev_y = self.prev_y
+        half_w = self.half_w
+        half_h = self.half_h
+        speed = self.speed
+        hit = -1
+        culled = []
+        for i in range(n):
+            y0 = y[i]
+            prev_y[i] = y0
+            yi = y0 - speed[i] * dt
+            y[i] = yi
+            hh = half_h[i]
+            if yi < -2 * hh:
+                culled.append(i)
+            if hit < 0:
+                # Inline swept_hit(): bricks only move down, so yi <= y0
+                xi = x[i]
+                dx = (left - xi if xi < left else xi - right if xi > right else 0.0) - half_w[i]
+                if dx < radius:
+                    if dx < 0:
+                        dx = 0.0
+                    reach = hh + (r2 - dx * dx) ** 0.5
+                    if yi < cy + reach and y0 > cy - reach:
+                        hit = i
+        culled.reverse()
+        return hit, culled
+
+    def visible(self, alpha, top):
+        """Yield (brick, x, y) for bricks on screen, y interpolated by `alpha`"""
+        n = self.count
+        if n == 0:
+            return
+        bricks = self.bricks
+        if self.vectorized:
+            prev_y = self.prev_y[:n]
+            ys = prev_y + (self.y[:n] - prev_y) * alpha
+            half_h = self.half_h[:n]
+            on_screen = np.flatnonzero((ys - half_h < top) & (ys + half_h > 0))
+            xs = self.x
+            for i in on_screen.tolist():
+                yield bricks[i], float(xs[i]), float(ys[i])
+            return
+
+        x = self.x
+        y = self.y
+        prev_y = self.prev_y
+        half_h = self.half_h
+        for i in range(n):
+            py = prev_y[i]
+            yi = py + (y[i] - py) * alpha
+            hh = half_h[i]
+            if yi - hh < top and yi + hh > 0:
+                yield bricks[i], x[i], yi
@@ -0,0 +1,71 @@
+# coding: utf-8
+"""Background work with completions delivered on the main thread.
+
+Blocking work (name prompts, file I/O, asset decoding) runs on a small
+thread pool. Its results never touch the scene from a worker. Instead,
+each completion callback goes onto a deque, and the scene's update()
+drains that deque with a per-frame time budget. deque.append and
+deque.popleft are atomic in CPython, so the queue needs no lock.
+"""
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskRunner:
+    def __init__(self, workers=2):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bricks-worker')
+        self.completions = collections.deque()
+        self.drained = 0
+
+    def submit(self, fn, *args, on_done=None, on_error=None):
+        """Run fn(*args) on a worker.
+
+        on_done(result) or on_error(exception) is then called from drain()
+        on the main thread. Returns the Future.
+        """
+        future = self.pool.submit(fn, *args)
+
+        def finished(future):
+            try:
+                result = future.result()
+            except BaseException as e:
+                if on_error is not None:
+                    self.completions.append((on_error, (e,)))
+                else:
+                    print(f"Background task failed: {e}")
+            else:
+                if on_done is not None:
+                    self.completions.append((on_done, (result,)))
+        future.add_done_callback(finished)
+        return future
+
+    def call_soon(self, fn, *args):
+        """Queue fn(*args) to run on the main thread; safe from any thread"""
+        self.completions.append((fn, args))
+
+    def drain(self, budget=0.002):
+        """Run queued callbacks until the queue is empty or `budget` seconds pass.
+
+        Always runs at least one callback so the queue can't starve.
+        Returns the number run.
+        """
+        deadline = time.perf_counter() + budget
+        count = 0
+        while self.completions:
+            fn, args = self.completions.popleft()
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Error in completion callback: {e}")
+            count += 1
+            if time.perf_counter() >= deadline:
+                break
+        self.drained += count
+        return count
+
+    def pending(self):
+        return len(self.completions)
+
+    def shutdown(self, wait=False):
+        self.pool.shutdown(wait=wait)
@@ -0,0 +1,235 @@
+# coding: utf-8
+"""Session telemetry: an append-only log plus running totals.
+
+Each game adds two NDJSON records to the log: 'start' when it begins, and
+'end' at game over with its duration, score, level, per-level durations,
+death cause and frame-time percentiles. The log is split into segments
+(sessions-000001.ndjson, ...) and a new one is started once the current
+one passes `max_bytes`.
+
+A fileio.BackgroundWriter appends records and folds each 'end' into stats.json,
+an aggregate that is rewritten atomically. So the stats screen reads one
+small file, however long the history. The main thread only queues
+records.
+
+    python -m bricks.telemetry stats [dir]
+    python -m bricks.telemetry compact [dir]    # merge closed segments
+    python -m bricks.telemetry rebuild [dir]    # recompute stats.json
+"""
+import glob
+import json
+import os
+import re
+import sys
+import time
+from array import array
+
+from .fileio import BackgroundWriter, atomic_open, write_json
+
+SEGMENT = 'sessions-{:06d}.ndjson'
+SEGMENT_RE = re.compile(r'sessions-(\d{6})\.ndjson$')
+STATS = 'stats.json'
+
+HIST_MS = 0.5  # Frame-time histogram bucket width
+HIST_BINS = 200  # Up to 100 ms; longer frames land in the last bucket
+
+
+def segments(directory):
+    """Segment paths, oldest first"""
+    paths = glob.glob(os.path.join(directory, 'sessions-*.ndjson'))
+    return sorted(p for p in paths if SEGMENT_RE.search(p))
+
+
+def empty_stats():
+    return {'sessions': 0, 'seconds': 0.0, 'best_score': 0, 'best_level': 0,
+            'deaths': {}, 'reached': [], 'level_seconds': [], 'frame_p95_sum': 0.0}
+
+
+def fold(stats, record):
+    """Add one 'end' record to the aggregate, in place"""
+    stats['sessions'] += 1
+    stats['seconds'] += record['duration']
+    stats['best_score'] = max(stats['best_score'], record['score'])
+    stats['best_level'] = max(stats['best_level'], record['level'])
+    death = record.get('death') or 'none'
+    stats['deaths'][death] = stats['deaths'].get(death, 0) + 1
+    for i, seconds in enumerate(record['levels']):
+        if i == len(stats['reached']):
+            stats['reached'].append(0)
+            stats['level_seconds'].append(0.0)
+        stats['reached'][i] += 1
+        stats['level_seconds'][i] += seconds
+    stats['frame_p95_sum'] += record['frame_ms']['p95']
+    return stats
+
+
+def load_stats(directory):
+    """The aggregate, without touching the log"""
+    try:
+        with open(os.path.join(directory, STATS)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return empty_stats()
+    except Exception as e:
+        print(f"Error loading stats: {e}")
+        return empty_stats()
+
+
+class SessionTracker:
+    """Collects one game's numbers on the main thread, allocation-free per frame"""
+
+    def __init__(self):
+        self.hist = array('I', [0] * HIST_BINS)
+        self.level_starts = [0.0]
+
+    def begin(self, engine):
+        """Reset for a new game; returns its 'start' record"""
+        for i in range(HIST_BINS):
+            self.hist[i] = 0
+        self.level_starts = [0.0]
+        return {'type': 'start', 'ts': time.time(), 'seed': engine.seed,
+                'difficulty': engine.difficulty, 'width': engine.width, 'height': engine.height}
+
+    def frame(self, dt):
+        self.hist[min(HIST_BINS - 1, int(dt * 1000 / HIST_MS))] += 1
+
+    def level_up(self, engine):
+        self.level_starts.append(engine.time)
+
+    def percentile(self, fraction):
+        total = sum(self.hist)
+        if not total:
+            return 0.0
+        target = fraction * total
+        seen = 0
+        for i, count in enumerate(self.hist):
+            seen += count
+            if seen >= target:
+                return (i + 1) * HIST_MS  # Upper edge of the bucket
+        return HIST_BINS * HIST_MS
+
+    def end(self, engine):
+        """The game's 'end' record"""
+        bounds = self.level_starts + [engine.time]
+        return {
+            'type': 'end', 'ts': time.time(), 'seed': engine.seed, 'difficulty': engine.difficulty,
+            'duration': round(engine.time, 3), 'score': int(engine.score), 'level': engine.level,
+            'death': engine.death_cause,
+            'levels': [round(b - a, 3) for a, b in zip(bounds, bounds[1:])],
+            'frame_ms': {'p50': self.percentile(0.50), 'p95': self.percentile(0.95),
+                         'p99': self.percentile(0.99)},
+        }
+
+
+class TelemetryLog:
+    def __init__(self, directory='telemetry', max_bytes=256 * 1024, coalesce_delay=0.5):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = None  # Loaded on the writer thread before the first write
+        self.records = 0
+        # A start/end pair and anything else queued with it land in one write
+        self.writer = BackgroundWriter(self._write, 'telemetry-writer', coalesce_delay)
+
+    def append(self, record):
+        """Queue a record; never blocks on I/O"""
+        self.writer.put(record)
+
+    def flush(self, timeout=None):
+        return self.writer.flush(timeout)
+
+    def close(self, timeout=None):
+        self.writer.close(timeout)
+
+    def _open(self):
+        # Files are only touched from the writer thread, starting with the aggregate
+        os.makedirs(self.directory, exist_ok=True)
+        self.stats = load_stats(self.directory)
+        existing = segments(self.directory)
+        self.segment = int(SEGMENT_RE.search(existing[-1]).group(1)) if existing else 1
+
+    def _write(self, batch):
+        try:
+            self._append(batch)
+        except Exception as e:
+            print(f"Error writing telemetry: {e}")
+        self.records += len(batch)
+
+    def _append(self, batch):
+        if self.stats is None:
+            self._open()
+        path = os.path.join(self.directory, SEGMENT.format(self.segment))
+        if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            self.segment += 1
+            path = os.path.join(self.directory, SEGMENT.format(self.segment))
+        data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in batch)
+        with open(path, 'a') as f:
+            f.write(data)
+        ended = [record for record in batch if record.get('type') == 'end']
+        for record in ended:
+            fold(self.stats, record)
+        if ended:
+            write_json(os.path.join(self.directory, STATS), self.stats)
+
+
+def read_records(paths):
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        print(f"Skipping damaged line in {path}")
+
+
+def compact(directory):
+    """Merge every closed segment (all but the newest) into the oldest one"""
+    closed = segments(directory)[:-1]
+    if len(closed) < 2:
+        return 0
+    target = closed[0]
+    with atomic_open(target) as out:
+        for record in read_records(closed):
+            out.write(json.dumps(record, separators=(',', ':')) + '\n')
+    for path in closed[1:]:
+        os.remove(path)
+    return len(closed) - 1
+
+
+def rebuild(directory):
+    """Recompute stats.json from the whole log"""
+    stats = empty_stats()
+    for record in read_records(segments(directory)):
+        if record.get('type') == 'end':
+            fold(stats, record)
+    write_json(os.path.join(directory, STATS), stats)
+    return stats
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Falling Bricks session telemetry')
+    parser.add_argument('command', choices=('stats', 'compact', 'rebuild'))
+    parser.add_argument('directory', nargs='?', default='telemetry')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compact':
+        merged = compact(args.directory)
+        print(f"Merged {merged} segment(s) into {segments(args.directory)[0]}" if merged
+              else 'Nothing to compact')
+        return 0
+    stats = rebuild(args.directory) if args.command == 'rebuild' else load_stats(args.directory)
+    sessions = stats['sessions']
+    print(f"{sessions} sessions, {stats['seconds'] / 60:.1f} minutes played, "
+          f"best score {stats['best_score']}, best level {stats['best_level']}")
+    if sessions:
+        print(f"deaths: {stats['deaths']}, mean p95 frame {stats['frame_p95_sum'] / sessions:.1f} ms")
+        for i, (reached, seconds) in enumerate(zip(stats['reached'], stats['level_seconds'])):
+            print(f"  level {i + 1:>2}: reached {reached / sessions:6.1%}, "
+                  f"mean {seconds / reached:5.1f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
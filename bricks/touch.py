@@ -0,0 +1,198 @@
+# coding: utf-8
+"""Touch input pipeline.
+
+Pythonista calls touch_moved() once per touch event, and a finger can
+produce several events per frame. Writing each one straight to the player
+node wastes node updates. The ball also shows where the finger was before
+the frame was drawn, about a frame behind.
+
+TouchInput buffers samples with their timestamps. Once per frame, frame()
+returns two positions:
+
+- the newest sample, unpredicted. It goes to the engine, so collision and
+  replays only ever see real finger positions
+- a predicted position, used only to draw the ball. It is the newest
+  sample pushed `lead` seconds ahead along a least-squares velocity fit
+  over the last `window` seconds, at most `max_lead` units away
+
+Once the finger stops sending events, the drawn ball settles back onto
+the true position.
+
+    python -m bricks.touch    # latency harness with synthetic touch streams
+"""
+import collections
+import math
+import random
+import sys
+
+
+class TouchInput:
+    def __init__(self, lead=0.024, window=0.05, max_lead=24, settle_frames=2, capacity=32):
+        self.lead = lead  # Seconds to predict ahead of the newest sample
+        self.window = window  # Seconds of samples in the velocity fit
+        self.max_lead = max_lead  # Furthest the drawn ball gets from the true position
+        self.settle_frames = settle_frames  # Frames without samples before prediction stops
+        self.samples = collections.deque(maxlen=capacity)  # (timestamp, x), oldest first
+        self.fresh = 0  # Samples since the last frame()
+        self.idle = 0  # Frames in a row without samples
+        self.true_x = None
+        self.shown_x = None
+        self.events = 0
+        self.updates = 0  # Frames that moved the player
+
+    def add(self, x, timestamp):
+        self.samples.append((timestamp, x))
+        self.fresh += 1
+        self.events += 1
+
+    def release(self):
+        """Finger lifted: drop the history; the drawn ball settles next frame"""
+        self.samples.clear()
+        self.fresh = 0
+        self.idle = self.settle_frames
+
+    def reset(self):
+        """Forget everything, e.g. for a new game that moves the player itself"""
+        self.release()
+        self.true_x = None
+        self.shown_x = None
+
+    def velocity(self):
+        """Least-squares slope of x over the last `window` seconds, units/s"""
+        newest = self.samples[-1][0]
+        points = [(t - newest, x) for t, x in self.samples if newest - t <= self.window]
+        n = len(points)
+        if n < 2:
+            return 0.0
+        mean_t = sum(t for t, _ in points) / n
+        mean_x = sum(x for _, x in points) / n
+        var = sum((t - mean_t) ** 2 for t, _ in points)
+        if var <= 0:
+            return 0.0
+        return sum((t - mean_t) * (x - mean_x) for t, x in points) / var
+
+    def frame(self, low, high):
+        """Once per frame: (true x, drawn x), or None if the ball stays put.
+
+        The drawn x is kept within [low, high].
+        """
+        if not self.fresh:
+            self.idle += 1
+            if self.true_x is None or self.shown_x == self.true_x or self.idle < self.settle_frames:
+                return None
+            # Finger still or lifted: settle on the true position
+            self.shown_x = self.true_x
+            self.updates += 1
+            return self.true_x, self.shown_x
+        self.fresh = 0
+        self.idle = 0
+        true_x = self.samples[-1][1]
+        lead = max(-self.max_lead, min(self.velocity() * self.lead, self.max_lead))
+        self.true_x = true_x
+        self.shown_x = min(max(true_x + lead, low), high)
+        self.updates += 1
+        return self.true_x, self.shown_x
+
+
+# Latency harness: synthetic finger paths, sampled like a touch screen and
+# drawn at the frame rate, compared against raw per-event positioning
+
+def sweep(t):
+    """Side to side, one round trip a second"""
+    return 195 + 150 * math.sin(2 * math.pi * t)
+
+
+def flick(t):
+    """Quick eased dashes between spots, with rests in between"""
+    spots = (60, 330, 120, 300, 195, 40, 350)
+    leg, dash = divmod(t / 0.6, 1.0)
+    a = spots[int(leg) % len(spots)]
+    b = spots[(int(leg) + 1) % len(spots)]
+    u = min(1.0, dash / 0.5)  # Dash for 0.3 s, rest for 0.3 s
+    return a + (b - a) * (u * u * (3 - 2 * u))
+
+
+def wander(t):
+    """Slow, irregular drift"""
+    return 195 + 80 * math.sin(1.3 * t) + 40 * math.sin(3.7 * t + 1)
+
+
+STREAMS = {'sweep': sweep, 'flick': flick, 'wander': wander}
+
+
+def simulate(path, seconds, rate, fps, jitter, noise, seed, touch_input):
+    """Feed `path` at `rate` events/s into the raw and buffered pipelines.
+
+    Returns per-frame (display time, raw x, buffered x) and the node writes
+    made by the raw path. Fails if the engine would ever get anything but
+    the newest real touch.
+    """
+    rng = random.Random(seed)
+    events = []
+    t = 0.0
+    while t < seconds:
+        # Touch events arrive at roughly `rate`, with delivery jitter
+        events.append((t, path(t) + rng.gauss(0, noise)))
+        t += max(1e-4, rng.gauss(1 / rate, jitter / rate))
+    frames = []
+    raw_writes = 0
+    raw_x = events[0][1]
+    next_event = 0
+    for n in range(1, int(seconds * fps)):
+        now = n / fps
+        while next_event < len(events) and events[next_event][0] <= now:
+            ts, x = events[next_event]
+            raw_x = x  # touch_moved() used to write every event to the node
+            raw_writes += 1
+            touch_input.add(x, ts)
+            next_event += 1
+        moved = touch_input.frame(15, 375)
+        if moved is not None and moved[0] != raw_x:
+            raise AssertionError('engine position differs from the newest touch')
+        shown_x = touch_input.shown_x if touch_input.shown_x is not None else raw_x
+        frames.append((now + 1 / fps, raw_x, shown_x))  # On screen a frame later
+    return frames, raw_writes
+
+
+def lag(path, frames, column, min_lag=-0.02, max_lag=0.08, step=0.0005):
+    """Effective latency: the delay of the finger path that best matches what
+    was drawn. Negative means the drawn ball runs ahead of the finger."""
+    best = None
+    for i in range(int((max_lag - min_lag) / step) + 1):
+        tau = min_lag + i * step
+        error = sum(abs(f[column] - path(f[0] - tau)) for f in frames) / len(frames)
+        if best is None or error < best[1]:
+            best = (tau, error)
+    return best[0]
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Touch input latency harness')
+    parser.add_argument('--stream', default=','.join(STREAMS), help=f"comma list of {', '.join(STREAMS)}")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rate', type=float, default=120, help='touch events per second')
+    parser.add_argument('--fps', type=float, default=60)
+    parser.add_argument('--jitter', type=float, default=0.15, help='event timing jitter, fraction of the interval')
+    parser.add_argument('--noise', type=float, default=0.5, help='touch position noise, units')
+    parser.add_argument('--lead-ms', type=float, default=24)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{args.rate:g} touch events/s, {args.fps:g} fps, drawn one frame after update")
+    print(f"{'stream':<8} {'path':<9} {'latency':>8} {'error':>8} {'max err':>8} {'writes/frame':>13}")
+    for name in args.stream.split(','):
+        path = STREAMS[name]
+        touch_input = TouchInput(lead=args.lead_ms / 1000)
+        frames, raw_writes = simulate(path, args.seconds, args.rate, args.fps, args.jitter,
+                                      args.noise, args.seed, touch_input)
+        for label, column, writes in (('raw', 1, raw_writes), ('buffered', 2, touch_input.updates)):
+            errors = [abs(f[column] - path(f[0])) for f in frames]
+            print(f"{name:<8} {label:<9} {lag(path, frames, column) * 1000:6.1f}ms "
+                  f"{sum(errors) / len(errors):7.2f}u {max(errors):7.2f}u "
+                  f"{writes / len(frames):13.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# coding: utf-8
+"""Minimal stand-in for the parts of Pythonista's ui module the HUD uses.
+
+Images only know their size; nothing is drawn. scene_stub.install()
+installs this as `ui` alongside the scene stub.
+"""
+import sys
+
+__all__ = ['Image', 'ImageContext', 'measure_string', 'draw_string']
+
+
+class Image:
+    def __init__(self, size):
+        self.size = size
+
+
+class ImageContext:
+    def __init__(self, width, height, scale=0):
+        self.width = width
+        self.height = height
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def get_image(self):
+        from .scene_stub import Size
+        return Image(Size(self.width, self.height))
+
+
+def measure_string(string, max_width=0, font=('<system>', 12), **kwargs):
+    return len(string) * font[1] * 0.55, font[1] * 1.2
+
+
+def draw_string(string, rect=(0, 0, 0, 0), font=('<system>', 12), color='black', **kwargs):
+    pass
+
+
+def install():
+    """Register this module as `ui`"""
+    sys.modules['ui'] = sys.modules[__name__]